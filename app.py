@@ -9,6 +9,9 @@
 Τεχνολογίες: Python Flask, SQLite, HTML, CSS, Bootstrap 5, JavaScript
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()  # αρχή της ψυχρής εκκίνησης (βλ. COLD_START_BUDGET_MS)
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -17,16 +20,30 @@ except ModuleNotFoundError:
 
 from flask import (
     Flask, render_template, request, redirect, url_for, jsonify,
-    session, flash, send_from_directory, g
+    session, flash, send_from_directory, send_file, g, make_response, stream_with_context, abort,
+    has_request_context, before_render_template, template_rendered
 )
+import click
 import sqlite3
 import os
+import base64
+import bisect
 import json
+import re
+import unicodedata
+import hashlib
+import queue
+import random
+import secrets
+import sys
+import threading
+from collections import OrderedDict
 from calendar import monthrange
 from datetime import datetime, timedelta, date
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from functools import wraps
+from urllib.parse import quote
 
 # Greek month names for calendar (index 0 unused, 1–12 = Jan–Dec)
 _CAL_MONTHS_EL = ('', 'Ιανουάριος', 'Φεβρουάριος', 'Μάρτιος', 'Απρίλιος', 'Μάιος', 'Ιούνιος',
@@ -64,12 +81,1018 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Βοηθητικές συναρτήσεις για τη βάση δεδομένων
 
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+
+# Προφίλ απόδοσης SQLite (DB_PROFILE). Και τα δύο χρησιμοποιούν WAL ώστε οι αναγνώσεις
+# να μην μπλοκάρουν από τις εγγραφές και οι ταυτόχρονοι writers να περιμένουν (busy_timeout)
+# αντί να αποτυγχάνουν με "database is locked".
+#   durable: synchronous=FULL, προεπιλεγμένο cache, χωρίς mmap (ασφαλές και σε διακοπή ρεύματος)
+#   fast:    synchronous=NORMAL, 64MB cache, 256MB mmap, temp tables στη μνήμη
+DB_PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def _db_pragmas():
+    """Ρυθμίσεις του επιλεγμένου προφίλ· κάθε pragma μπορεί να αλλάξει με DB_<PRAGMA> (π.χ. DB_BUSY_TIMEOUT)"""
+    profile = os.environ.get('DB_PROFILE', 'durable').lower()
+    pragmas = dict(DB_PROFILES.get(profile, DB_PROFILES['durable']))
+    for name in pragmas:
+        value = os.environ.get('DB_' + name.upper())
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+DB_PRAGMAS = _db_pragmas()
+
+
+class ConnectionPool:
+    """Pool συνδέσεων SQLite ανά process.
+
+    Κρατά έως `size` αδρανείς συνδέσεις· όταν αδειάσει ανοίγει νέες (overflow),
+    που κλείνουν κατά την επιστροφή αν το pool είναι γεμάτο. Μετά από fork
+    (pre-fork workers) οι κληρονομημένες συνδέσεις απορρίπτονται.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, pragmas=None):
+        self.path = path
+        self.size = max(size, 1)
+        self.pragmas = pragmas or {}
+        # Προαιρετικό callback για κάθε εκτελούμενο SQL (sqlite3 set_trace_callback)
+        self.trace_callback = None
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._pid = os.getpid()
+        # Για τα gauges του /metrics: συνδέσεις σε χρήση και πόσες ανοίχτηκαν συνολικά
+        self._stats_lock = threading.Lock()
+        self.in_use = 0
+        self.opened = 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, factory=MeteredConnection)
+        with self._stats_lock:
+            self.opened += 1
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys = ON")
+        # Ρυθμίσεις ανά σύνδεση· το journal_mode είναι μόνιμο στο αρχείο και ορίζεται από το prepare_db
+        for name in ('busy_timeout', 'synchronous', 'cache_size', 'mmap_size', 'temp_store'):
+            if name in self.pragmas:
+                db.execute('PRAGMA {} = {}'.format(name, self.pragmas[name]))
+        return db
+
+    def apply_journal_mode(self):
+        """Ορισμός journal_mode (π.χ. WAL) μία φορά, όταν η βάση δημιουργείται ή αναβαθμίζεται"""
+        mode = self.pragmas.get('journal_mode')
+        if not mode:
+            return None
+        db = self._connect()
+        try:
+            return db.execute('PRAGMA journal_mode = {}'.format(mode)).fetchone()[0]
+        finally:
+            db.close()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Νέο process: οι συνδέσεις του γονέα δεν κλείνουν εδώ (ανήκουν σε εκείνον)
+            self._idle = queue.LifoQueue(maxsize=self.size)
+            self._pid = os.getpid()
+            self._stats_lock = threading.Lock()
+            self.in_use = self.opened = 0
+
+    def stats(self):
+        return {'idle': self._idle.qsize(), 'in_use': self.in_use, 'opened': self.opened}
+
+    def acquire(self):
+        """Αδρανής και υγιής σύνδεση από το pool, ή νέα αν δεν υπάρχει διαθέσιμη."""
+        self._check_pid()
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                db = self._connect()
+                break
+            try:
+                db.execute('SELECT 1').fetchone()
+                break
+            except sqlite3.Error:
+                self._discard(db)
+        if self.trace_callback is not None:
+            db.set_trace_callback(self.trace_callback)
+        with self._stats_lock:
+            self.in_use += 1
+        return db
+
+    def release(self, db):
+        """Επιστροφή σύνδεσης· ό,τι δεν έγινε commit ακυρώνεται."""
+        self._check_pid()
+        with self._stats_lock:
+            self.in_use = max(self.in_use - 1, 0)
+        try:
+            db.set_trace_callback(None)
+            if db.in_transaction:
+                db.rollback()
+            self._idle.put_nowait(db)
+        except (sqlite3.Error, queue.Full):
+            self._discard(db)
+
+    @staticmethod
+    def _discard(db):
+        try:
+            db.close()
+        except sqlite3.Error:
+            pass
+
+
+_db_pool = ConnectionPool(DB_PATH, pragmas=DB_PRAGMAS)
+
+
 def get_db():
-    """Σύνδεση με τη βάση δεδομένων SQLite"""
-    db = sqlite3.connect(DB_PATH)
-    db.row_factory = sqlite3.Row
-    db.execute("PRAGMA foreign_keys = ON")
-    return db
+    """Σύνδεση της τρέχουσας αίτησης: μία από το pool ανά request, κοινή για routes και context processors"""
+    if 'db' not in g:
+        g.db = _db_pool.acquire()
+        trace = g.get('sql_trace')
+        if trace is not None:
+            g.db = TracedConnection(g.db, trace)
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Επιστροφή της σύνδεσης του request στο pool"""
+    db = g.pop('db', None)
+    if db is not None:
+        _db_pool.release(getattr(db, 'raw', db))
+    trace = g.pop('sql_trace', None)
+    if trace is not None:
+        log_sql_trace(trace)
+
+
+# --- SQL tracing ανά request ---
+# Σε ποσοστό SQL_TRACE_RATE των requests (προεπιλογή: όλα σε DEBUG, κανένα αλλιώς) η σύνδεση του
+# get_db() τυλίγεται σε TracedConnection, που καταγράφει κάθε statement: SQL, τύπους παραμέτρων,
+# γραμμές και διάρκεια (execute και fetch). Το σύνολο μπαίνει στο header Server-Timing· statements
+# με το ίδιο σχήμα που επαναλαμβάνονται SQL_NPLUSONE_MIN φορές (N+1) και όσα ξεπερνούν τα
+# SQL_SLOW_MS γράφονται στο log. Στα υπόλοιπα requests το get_db() δίνει την απλή σύνδεση.
+
+SQL_TRACE_RATE = float(os.environ.get('SQL_TRACE_RATE', '1' if app.config['DEBUG'] else '0'))
+SQL_SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 100))
+SQL_NPLUSONE_MIN = int(os.environ.get('SQL_NPLUSONE_MIN', 5))
+
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_LIST_RE = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+class SqlTrace:
+    """Τα statements ενός request: λίστες [sql, τύποι παραμέτρων, γραμμές, δευτερόλεπτα]."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.entries = []
+
+    def add(self, sql, params):
+        entry = [sql, _params_shape(params), 0, 0.0]
+        self.entries.append(entry)
+        return entry
+
+    def total_ms(self):
+        return sum(entry[3] for entry in self.entries) * 1000
+
+    def nplusone(self):
+        """(σχήμα, πλήθος) για κάθε σχήμα statement που επαναλήφθηκε τουλάχιστον SQL_NPLUSONE_MIN φορές."""
+        counts = {}
+        for entry in self.entries:
+            shape = sql_shape(entry[0])
+            counts[shape] = counts.get(shape, 0) + 1
+        return [(shape, n) for shape, n in counts.items() if n >= SQL_NPLUSONE_MIN]
+
+
+def sql_shape(sql):
+    """Το statement χωρίς literals και λίστες παραμέτρων: ίδιο σχήμα = ίδιο query με άλλες τιμές."""
+    return _SQL_LIST_RE.sub('?, ...', _SQL_LITERAL_RE.sub('?', ' '.join(sql.split())))
+
+
+def _params_shape(params):
+    # Μόνο οι τύποι, όχι οι τιμές (δεν γράφονται δεδομένα χρηστών στο log)
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return tuple(type(value).__name__ for value in params)
+
+
+class TracedCursor:
+    """Cursor που προσθέτει στο entry του statement τις γραμμές και τον χρόνο των fetch."""
+
+    def __init__(self, cursor, entry):
+        self._cursor = cursor
+        self._entry = entry
+
+    def _fetch(self, method, *args):
+        t0 = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._entry[3] += time.perf_counter() - t0
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._entry[2] += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._entry[2] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._entry[2] += len(rows)
+        return rows
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    """Σύνδεση του request που καταγράφει κάθε execute στο SqlTrace (τα υπόλοιπα πάνε στο raw)."""
+
+    def __init__(self, raw, trace):
+        self.raw = raw
+        self.trace = trace
+
+    def _run(self, method, sql, params, shape_params):
+        entry = self.trace.add(sql, shape_params)
+        t0 = time.perf_counter()
+        try:
+            cursor = method(sql, params) if params is not None else method(sql)
+        finally:
+            entry[3] = time.perf_counter() - t0
+        if cursor.rowcount > 0:
+            entry[2] = cursor.rowcount  # INSERT/UPDATE/DELETE: γραμμές που άλλαξαν
+        return TracedCursor(cursor, entry)
+
+    def execute(self, sql, params=()):
+        return self._run(self.raw.execute, sql, params, params)
+
+    def executemany(self, sql, seq_of_params):
+        rows = list(seq_of_params)
+        shape = ('{}x'.format(len(rows)),) + _params_shape(rows[0] if rows else ())
+        return self._run(self.raw.executemany, sql, rows, shape)
+
+    def executescript(self, script):
+        return self._run(self.raw.executescript, script, None, ())
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+@app.before_request
+def start_sql_trace():
+    if SQL_TRACE_RATE >= 1 or (SQL_TRACE_RATE > 0 and random.random() < SQL_TRACE_RATE):
+        g.sql_trace = SqlTrace(request.endpoint)
+
+
+@app.after_request
+def add_server_timing(response):
+    """Server-Timing με τον χρόνο και το πλήθος των queries (μόνο στα requests με tracing)."""
+    trace = g.get('sql_trace')
+    if trace is not None and trace.entries:
+        response.headers.add('Server-Timing', 'db;dur={:.1f};desc="{} queries"'.format(
+            trace.total_ms(), len(trace.entries)))
+        suspects = trace.nplusone()
+        if suspects:
+            response.headers.add('Server-Timing', 'nplusone;desc="{}"'.format(
+                ', '.join('{}x'.format(n) for _, n in suspects)))
+        response.headers.add('Server-Timing', 'app;dur={:.1f}'.format((time.perf_counter() - trace.started) * 1000))
+    return response
+
+
+def log_sql_trace(trace):
+    """Slow-query log και N+1 υποψίες του request (στο teardown, ώστε να μετρούν και τα streaming responses)."""
+    for sql, params, rows, seconds in trace.entries:
+        if seconds * 1000 >= SQL_SLOW_MS:
+            app.logger.warning('Αργό query σε %s: %.1f ms, %d γραμμές, παράμετροι %s: %s',
+                               trace.endpoint, seconds * 1000, rows, params, ' '.join(sql.split()))
+    for shape, count in trace.nplusone():
+        app.logger.warning('Πιθανό N+1 σε %s: %d φορές %s', trace.endpoint, count, shape)
+
+
+# --- Metrics (Prometheus) ---
+# Registry στη μνήμη του process: latency και status ανά endpoint, requests σε εξέλιξη, χρόνος
+# templates, bytes uploads, αναμονή για το lock εγγραφής της SQLite και κατάσταση του pool.
+# Εξάγεται στο /metrics σε μορφή κειμένου Prometheus. Με pre-fork server (πολλά processes) κάθε
+# process γράφει το snapshot του στο METRICS_DIR/<pid>.json (το πολύ κάθε METRICS_FLUSH_SECONDS)
+# και το /metrics αθροίζει όλα τα αρχεία· τα gauges μετρούν μόνο από processes που ζουν ακόμη.
+# Το METRICS_DIR αδειάζει πριν από κάθε εκκίνηση του server.
+
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# όνομα -> (τύπος, περιγραφή)
+METRICS_HELP = {
+    'lms_http_requests_total': ('counter', 'Requests ανά endpoint, μέθοδο και status'),
+    'lms_http_request_duration_seconds': ('histogram', 'Χρόνος απόκρισης ανά endpoint (μέχρι το τέλος του σώματος)'),
+    'lms_http_requests_in_flight': ('gauge', 'Requests σε εξέλιξη ανά endpoint'),
+    'lms_template_render_seconds': ('histogram', 'Χρόνος απόδοσης ανά Jinja template'),
+    'lms_upload_bytes_total': ('counter', 'Bytes αρχείων που ανέβηκαν, ανά endpoint'),
+    'lms_db_lock_wait_seconds': ('histogram', 'Διάρκεια της πρώτης εγγραφής κάθε συναλλαγής (αναμονή για το lock του writer)'),
+    'lms_db_pool_connections': ('gauge', 'Συνδέσεις του pool ανά κατάσταση (idle, in_use)'),
+    'lms_db_pool_opened_total': ('counter', 'Συνδέσεις SQLite που άνοιξε το pool'),
+}
+
+
+class Metrics:
+    """Counters, gauges και histograms του process (thread-safe)."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.values = {}      # (όνομα, labels) -> τιμή (counters και gauges)
+        self.histograms = {}  # (όνομα, labels) -> [πλήθος ανά bucket..., +Inf, άθροισμα]
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        index = bisect.bisect_left(METRICS_BUCKETS, value)
+        with self._lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                counts = self.histograms[key] = [0] * (len(METRICS_BUCKETS) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {'values': [[name, dict(labels), value] for (name, labels), value in self.values.items()],
+                    'histograms': [[name, dict(labels), list(counts)]
+                                   for (name, labels), counts in self.histograms.items()]}
+
+
+metrics = Metrics()
+# Ό,τι μέτρησε ο γονέας πριν από το fork (π.χ. gunicorn --preload) δεν ανήκει στους workers
+os.register_at_fork(after_in_child=metrics.reset)
+
+
+def _metrics_endpoint():
+    return (request.endpoint or 'unmatched') if has_request_context() else 'background'
+
+
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE')
+
+
+class MeteredConnection(sqlite3.Connection):
+    """Σύνδεση του pool που μετρά την πρώτη εγγραφή κάθε συναλλαγής.
+
+    Σε WAL οι αναγνώσεις δεν περιμένουν ποτέ· η πρώτη εγγραφή μιας συναλλαγής παίρνει το lock του
+    writer και, αν το κρατά άλλη σύνδεση, περιμένει έως busy_timeout. Η διάρκειά της είναι λοιπόν
+    κυρίως αναμονή για το lock. Οι υπόλοιπες εντολές περνούν με έναν μόνο έλεγχο (in_transaction).
+    """
+
+    def execute(self, sql, params=()):
+        if self.in_transaction or not sql.lstrip()[:15].upper().startswith(_WRITE_PREFIXES):
+            return super().execute(sql, params)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            metrics.observe('lms_db_lock_wait_seconds', time.perf_counter() - t0, endpoint=_metrics_endpoint())
+
+    def executemany(self, sql, seq_of_params):
+        if self.in_transaction:
+            return super().executemany(sql, seq_of_params)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            metrics.observe('lms_db_lock_wait_seconds', time.perf_counter() - t0, endpoint=_metrics_endpoint())
+
+
+def metrics_snapshot():
+    """Snapshot του process μαζί με τα gauges του pool συνδέσεων."""
+    snapshot = metrics.snapshot()
+    pool = _db_pool.stats()
+    snapshot['values'] += [['lms_db_pool_connections', {'state': 'idle'}, pool['idle']],
+                           ['lms_db_pool_connections', {'state': 'in_use'}, pool['in_use']],
+                           ['lms_db_pool_opened_total', {}, pool['opened']]]
+    return snapshot
+
+
+_metrics_flushed_at = 0.0
+
+
+def flush_metrics():
+    """Γράφει (ατομικά) το snapshot του process στο METRICS_DIR/<pid>.json."""
+    global _metrics_flushed_at
+    _metrics_flushed_at = time.monotonic()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, '{}.json'.format(os.getpid()))
+    tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # π.χ. PermissionError: το process υπάρχει
+    return True
+
+
+def collect_metrics():
+    """Άθροισμα του process και (με METRICS_DIR) των υπόλοιπων processes: (values, histograms)."""
+    snapshots = [metrics_snapshot()]
+    if METRICS_DIR and os.path.isdir(METRICS_DIR):
+        own = '{}.json'.format(os.getpid())
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith('.json') or not name[:-5].isdigit() or name == own:
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name), encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(int(name[:-5])):
+                snapshot['values'] = [v for v in snapshot['values'] if METRICS_HELP[v[0]][0] != 'gauge']
+            snapshots.append(snapshot)
+    values, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['values']:
+            key = Metrics.key(name, labels)
+            values[key] = values.get(key, 0) + value
+        for name, labels, counts in snapshot['histograms']:
+            merged = histograms.setdefault(Metrics.key(name, labels), [0] * len(counts))
+            for i, count in enumerate(counts):
+                merged[i] += count
+    return values, histograms
+
+
+def _metric_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                                           .replace('\n', '\\n')) for name, value in labels) + '}'
+
+
+def render_metrics(values, histograms):
+    """Κείμενο Prometheus (text format 0.0.4)."""
+    lines = []
+    bounds = ['{:g}'.format(bound) for bound in METRICS_BUCKETS] + ['+Inf']
+    for metric, (kind, help_text) in METRICS_HELP.items():
+        lines.append('# HELP {} {}'.format(metric, help_text))
+        lines.append('# TYPE {} {}'.format(metric, kind))
+        if kind == 'histogram':
+            for (name, labels), counts in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(metric, _metric_labels(labels + (('le', bound),)), cumulative))
+                lines.append('{}_sum{} {!r}'.format(metric, _metric_labels(labels), float(counts[-1])))
+                lines.append('{}_count{} {}'.format(metric, _metric_labels(labels), cumulative))
+        else:
+            for (name, labels), value in sorted(values.items()):
+                if name == metric:
+                    lines.append('{}{} {}'.format(metric, _metric_labels(labels), value))
+    return '\n'.join(lines) + '\n'
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    metrics.inc('lms_http_requests_in_flight', 1, endpoint=g.metrics_endpoint)
+
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Latency και status στο teardown, ώστε να μετρά και η αποστολή των streaming απαντήσεων."""
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    metrics.inc('lms_http_requests_in_flight', -1, endpoint=endpoint)
+    metrics.observe('lms_http_request_duration_seconds', time.perf_counter() - g.metrics_started, endpoint=endpoint)
+    metrics.inc('lms_http_requests_total', endpoint=endpoint, method=request.method,
+                status=str(g.get('metrics_status', 500)))
+    if METRICS_DIR and time.monotonic() - _metrics_flushed_at >= METRICS_FLUSH_SECONDS:
+        try:
+            flush_metrics()
+        except OSError:
+            app.logger.exception('metrics: αποτυχία εγγραφής στο %s', METRICS_DIR)
+
+
+@before_render_template.connect_via(app)
+def _template_render_started(sender, template, context, **extra):
+    g.setdefault('template_starts', []).append(time.perf_counter())
+
+
+@template_rendered.connect_via(app)
+def _template_render_finished(sender, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        metrics.observe('lms_template_render_seconds', time.perf_counter() - starts.pop(),
+                        template=template.name or '<string>')
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Μετρικές για Prometheus: με METRICS_TOKEN απαιτείται Authorization: Bearer <token>, αλλιώς
+    επιτρέπεται μόνο από localhost χωρίς proxy (X-Forwarded-For)."""
+    if METRICS_TOKEN:
+        if not secrets.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + METRICS_TOKEN):
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+        abort(403)
+    return app.response_class(render_metrics(*collect_metrics()), mimetype='text/plain; version=0.0.4')
+
+
+# --- Sampling profiler ---
+# Opt-in (PROFILER_TOKEN ή PROFILER_INSTRUCTORS=1). Ένα νήμα παίρνει κάθε PROFILER_INTERVAL_MS τη
+# στοίβα (sys._current_frames) των νημάτων που εξυπηρετούν request, για όσα δευτερόλεπτα ζητηθεί:
+#   duration: κρατά όλα τα δείγματα·
+#   slow:     κρατά τα δείγματα ενός request μόνο αν διήρκεσε τουλάχιστον slow_ms.
+# Εξάγει collapsed stacks (flamegraph.pl, speedscope) και σύνολα ανά συνάρτηση και ανά κατηγορία
+# (sqlite3, κατακερματισμός κωδικών, Jinja). Όταν δεν τρέχει, κάθε request κοστίζει έναν έλεγχο
+# του profiler.active και δεν υπάρχει νήμα.
+# Με πολλούς workers (PROFILER_DIR, κοινός φάκελος όπως το METRICS_DIR): το start/stop γράφεται στο
+# PROFILER_DIR/control.json και οι υπόλοιποι workers το ακολουθούν στο επόμενο request τους· κάθε
+# process γράφει τα δείγματά του στο PROFILER_DIR/<pid>.json και η αναφορά τα αθροίζει.
+
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN') or None
+PROFILER_INSTRUCTORS = os.environ.get('PROFILER_INSTRUCTORS', '0').lower() in ('1', 'true', 'yes')
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+PROFILER_MAX_SECONDS = int(os.environ.get('PROFILER_MAX_SECONDS', 600))
+PROFILER_DIR = os.environ.get('PROFILER_DIR') or None
+PROFILER_SYNC_SECONDS = 1.0  # το πολύ τόσο συχνά διαβάζει/γράφει κάθε process στο PROFILER_DIR
+
+# Γραμμή κώδικα που καλεί το C API του sqlite3 (το δείγμα σταματά στο τελευταίο Python frame)
+_SQLITE_CALL_RE = re.compile(r'\.(execute|executemany|executescript|fetchone|fetchall|fetchmany|commit|rollback)\(')
+
+
+def _frame_label(code):
+    filename = code.co_filename.replace('\\', '/')
+    short = '/'.join(filename.rsplit('/', 2)[-2:]) if 'site-packages' in filename else os.path.basename(filename)
+    return '{} ({}:{})'.format(getattr(code, 'co_qualname', code.co_name), short, code.co_firstlineno)
+
+
+def _sample_category(frame, files):
+    """Κατηγορία δείγματος: sqlite3 αν το τελευταίο Python frame περιμένει κλήση της sqlite3,
+    αλλιώς password_hashing / jinja αν περνά από werkzeug.security / template, αλλιώς other."""
+    import linecache  # μόνο με PROFILER_DIR· όχι στο import του app
+    if frame.f_code in _SQLITE_CODES or _SQLITE_CALL_RE.search(
+            linecache.getline(frame.f_code.co_filename, frame.f_lineno or 0)):
+        return 'sqlite3'
+    if any(name.endswith('werkzeug/security.py') for name in files):
+        return 'password_hashing'
+    if any('/jinja2/' in name or name.endswith('.html') for name in files):
+        return 'jinja'
+    return 'other'
+
+
+class SamplingProfiler:
+    """Δειγματοληψία στοιβών για τα requests ενός χρονικού παραθύρου (βλ. παραπάνω)."""
+
+    CATEGORIES = ('sqlite3', 'password_hashing', 'jinja', 'other')
+
+    def __init__(self, interval_ms, directory=None):
+        self.interval = interval_ms / 1000.0
+        self.directory = directory
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._synced_at = float('-inf')
+        self._flushed_samples = 0
+        self.in_progress = {}  # id νήματος -> [endpoint, έναρξη, δείγματα]
+        self._reset(None, 0, None, None, None)
+
+    def _reset(self, mode, seconds, slow_ms, capture_id, started_at):
+        self.mode, self.seconds, self.slow_ms = mode, seconds, slow_ms
+        self.capture_id, self.started_at = capture_id, started_at
+        self.until = time.monotonic() + seconds
+        self.stacks = {}  # (στοίβα, κατηγορία) -> δείγματα
+        self.samples = 0
+        self.captured = 0
+
+    def start(self, seconds, slow_ms=None, control=None):
+        """Νέα καταγραφή (τα προηγούμενα αποτελέσματα σβήνονται)· duration ή slow αν δοθεί slow_ms.
+
+        Με control (από το PROFILER_DIR) το process συμμετέχει σε καταγραφή που ξεκίνησε άλλο process.
+        """
+        with self._lock:
+            self.in_progress = {}
+            if control is None:
+                self._reset('slow' if slow_ms else 'duration', seconds, slow_ms, secrets.token_hex(8), time.time())
+            else:
+                self._reset(control['mode'], control['seconds'], control['slow_ms'], control['id'],
+                            control['started_at'])
+                self.until = time.monotonic() + (control['until'] - time.time())
+            self._flushed_samples = 0
+            self.active = True
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        if self.directory and control is None:
+            self._publish(time.time() + seconds)
+
+    def stop(self):
+        self.active = False
+        if self.directory and self.capture_id:
+            self._publish(time.time())
+
+    def _publish(self, until):
+        """Γράφει (ατομικά) την τρέχουσα καταγραφή στο control.json και σβήνει δείγματα παλαιότερων."""
+        os.makedirs(self.directory, exist_ok=True)
+        control = {'id': self.capture_id, 'mode': self.mode, 'seconds': self.seconds, 'slow_ms': self.slow_ms,
+                   'started_at': self.started_at, 'until': until}
+        path = os.path.join(self.directory, 'control.json')
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(control, f)
+        os.replace(tmp, path)
+        for name, data in self._snapshots():
+            if data.get('id') != self.capture_id:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _snapshots(self):
+        """(όνομα αρχείου, δεδομένα) για τα <pid>.json των άλλων processes στο PROFILER_DIR."""
+        own = '{}.json'.format(os.getpid())
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.json') or name in ('control.json', own):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    yield name, json.load(f)
+            except (OSError, ValueError):
+                continue  # process που μόλις γράφει ή αρχείο που σβήστηκε
+
+    def sync(self, force=False):
+        """Με PROFILER_DIR: ακολουθεί το start/stop άλλου process και γράφει τα δείγματα αυτού του
+        process (το πολύ μία φορά ανά PROFILER_SYNC_SECONDS, εκτός αν force)."""
+        now = time.monotonic()
+        if not self.directory or (not force and now - self._synced_at < PROFILER_SYNC_SECONDS):
+            return
+        self._synced_at = now
+        try:
+            with open(os.path.join(self.directory, 'control.json'), encoding='utf-8') as f:
+                control = json.load(f)
+        except (OSError, ValueError):
+            control = None
+        if control is not None:
+            if control['id'] != self.capture_id:
+                if control['until'] > time.time():
+                    self.start(control['seconds'], control['slow_ms'], control)
+                else:
+                    with self._lock:
+                        self._reset(control['mode'], control['seconds'], control['slow_ms'], control['id'],
+                                    control['started_at'])
+            elif self.active and control['until'] <= time.time():
+                self.active = False
+        self._flush()
+
+    def _flush(self):
+        """Γράφει (ατομικά) τα δείγματα του process στο PROFILER_DIR/<pid>.json, αν άλλαξαν."""
+        with self._lock:
+            if self.capture_id is None or self.samples == self._flushed_samples:
+                return
+            data = {'id': self.capture_id, 'pid': os.getpid(), 'samples': self.samples, 'requests': self.captured,
+                    'stacks': [[list(stack), category, count] for (stack, category), count in self.stacks.items()]}
+            self._flushed_samples = self.samples
+        path = os.path.join(self.directory, '{}.json'.format(os.getpid()))
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            app.logger.exception('profiler: αποτυχία εγγραφής στο %s', self.directory)
+
+    def _merged(self):
+        """Δείγματα του process και (με PROFILER_DIR) των άλλων processes της ίδιας καταγραφής."""
+        self.sync(force=True)
+        with self._lock:
+            stacks, samples, captured = dict(self.stacks), self.samples, self.captured
+        pids = [os.getpid()]
+        if self.directory and self.capture_id:
+            for _, data in self._snapshots():
+                if data.get('id') != self.capture_id:
+                    continue
+                pids.append(data['pid'])
+                samples += data['samples']
+                captured += data['requests']
+                for stack, category, count in data['stacks']:
+                    key = (tuple(stack), category)
+                    stacks[key] = stacks.get(key, 0) + count
+        return stacks, samples, captured, sorted(pids)
+
+    def request_started(self, endpoint):
+        self.in_progress[threading.get_ident()] = [endpoint, time.perf_counter(), []]
+
+    def request_finished(self):
+        entry = self.in_progress.pop(threading.get_ident(), None)
+        if entry is None or not entry[2]:
+            return
+        if self.mode == 'duration' or (time.perf_counter() - entry[1]) * 1000 >= self.slow_ms:
+            with self._lock:
+                self.captured += 1
+                for sample in entry[2]:
+                    self._add(sample)
+            if self.directory and not self.active:
+                self._flush()  # request που τελείωσε μετά το τέλος της καταγραφής
+
+    def _add(self, sample):
+        self.stacks[sample] = self.stacks.get(sample, 0) + 1
+        self.samples += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                done = not self.active or time.monotonic() >= self.until
+                if done:
+                    self.active = False
+                    self._thread = None
+            if done:
+                if self.directory:
+                    self._flush()  # τα τελευταία δείγματα, χωρίς να περιμένουν το επόμενο request
+                return
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, entry in list(self.in_progress.items()):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                leaf, labels, files = frame, [], []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    files.append(frame.f_code.co_filename.replace('\\', '/'))
+                    frame = frame.f_back
+                labels.append(entry[0])
+                entry[2].append((tuple(reversed(labels)), _sample_category(leaf, files)))
+            del frames
+
+    def collapsed(self):
+        """Collapsed stacks: «ρίζα;...;φύλλο πλήθος» ανά γραμμή."""
+        items = sorted(self._merged()[0].items())
+        merged = {}
+        for (stack, _), count in items:
+            line = ';'.join(label.replace(';', ',') for label in stack)
+            merged[line] = merged.get(line, 0) + count
+        return ''.join('{} {}\n'.format(line, count) for line, count in merged.items())
+
+    def report(self, top=50):
+        """Κατάσταση, σύνολα ανά κατηγορία και οι top συναρτήσεις (self / συνολικά δείγματα και ms)."""
+        stacks, total, captured, pids = self._merged()
+        items = list(stacks.items())
+        ms = self.interval * 1000
+        categories = dict.fromkeys(self.CATEGORIES, 0)
+        own, inclusive = {}, {}
+        for (stack, category), count in items:
+            categories[category] += count
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for label in set(stack[1:]):
+                inclusive[label] = inclusive.get(label, 0) + count
+        functions = sorted(inclusive, key=lambda label: (-own.get(label, 0), -inclusive[label]))[:top]
+        return {
+            'active': self.active, 'mode': self.mode, 'started_at': self.started_at,
+            'seconds': self.seconds, 'slow_ms': self.slow_ms, 'interval_ms': ms,
+            'samples': total, 'requests': captured, 'pid': os.getpid(), 'processes': pids,
+            'categories': {name: {'samples': n, 'ms': round(n * ms, 1),
+                                  'percent': round(100.0 * n / total, 1) if total else 0.0}
+                           for name, n in categories.items()},
+            'functions': [{'function': label, 'self': own.get(label, 0), 'total': inclusive[label],
+                           'self_ms': round(own.get(label, 0) * ms, 1), 'total_ms': round(inclusive[label] * ms, 1)}
+                          for label in functions],
+        }
+
+
+profiler = SamplingProfiler(PROFILER_INTERVAL_MS, PROFILER_DIR)
+_SQLITE_CODES = {MeteredConnection.execute.__code__, MeteredConnection.executemany.__code__,
+                 TracedConnection._run.__code__, TracedCursor._fetch.__code__}
+
+
+@app.before_request
+def start_profiling():
+    if profiler.directory:
+        profiler.sync()
+    if profiler.active:
+        profiler.request_started(request.endpoint or 'unmatched')
+
+
+@app.teardown_request
+def finish_profiling(exc):
+    if profiler.active or profiler.in_progress:
+        profiler.request_finished()
+
+
+def profiler_required(f):
+    """Decorator: PROFILER_TOKEN (Authorization: Bearer) ή εκπαιδευτής με PROFILER_INSTRUCTORS· 404 αν κανένα δεν ισχύει."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not PROFILER_TOKEN and not PROFILER_INSTRUCTORS:
+            abort(404)
+        token_ok = PROFILER_TOKEN and secrets.compare_digest(
+            request.headers.get('Authorization', ''), 'Bearer ' + PROFILER_TOKEN)
+        if not token_ok and not (PROFILER_INSTRUCTORS and session.get('role') == 'instructor'):
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@app.route('/profiler', methods=['GET'])
+@profiler_required
+def profiler_report():
+    return jsonify(profiler.report(top=request.args.get('top', 50, type=int)))
+
+
+@app.route('/profiler/start', methods=['POST'])
+@profiler_required
+def profiler_start():
+    """Έναρξη για seconds δευτερόλεπτα (προεπιλογή 30)· με slow_ms κρατά μόνο τα αργά requests."""
+    seconds = request.form.get('seconds', 30, type=int)
+    slow_ms = request.form.get('slow_ms', type=float)
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or (slow_ms is not None and slow_ms <= 0):
+        return jsonify({'error': 'Invalid seconds or slow_ms', 'max_seconds': PROFILER_MAX_SECONDS}), 400
+    profiler.start(seconds, slow_ms)
+    return jsonify(profiler.report(top=0)), 202
+
+
+@app.route('/profiler/stop', methods=['POST'])
+@profiler_required
+def profiler_stop():
+    profiler.stop()
+    return jsonify(profiler.report())
+
+
+@app.route('/profiler/profile.folded', methods=['GET'])
+@profiler_required
+def profiler_collapsed():
+    """Collapsed stacks για flame graph (flamegraph.pl profile.folded > flame.svg, ή speedscope)."""
+    response = app.response_class(profiler.collapsed(), mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename="profile.folded"'
+    return response
+
+
+# --- Cache ---
+# Backend με CACHE_BACKEND: "memory" (LRU ανά process, προεπιλογή) ή "sqlite" (κοινό αρχείο
+# για όλους τους workers του μηχανήματος, ώστε οι ακυρώσεις να φτάνουν σε όλους).
+
+class LRUCache:
+    """Cache στη μνήμη του process, με όριο εγγραφών (LRU) και TTL ανά κλειδί."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SQLiteCache:
+    """Κοινή cache σε ξεχωριστό αρχείο SQLite (τιμές σε JSON), για deployments με πολλούς workers.
+
+    Η cache δεν είναι ποτέ λόγος να αποτύχει ένα request: αν το αρχείο είναι κλειδωμένο πάνω από
+    το timeout (ή χαλασμένο), το get είναι miss και οι εγγραφές/ακυρώσεις παραλείπονται, με μήνυμα στο log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=1)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = OFF')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _write(self, sql, params):
+        db = None
+        try:
+            db = self._db()
+            db.execute(sql, params)
+            db.commit()
+        except sqlite3.Error:
+            app.logger.warning('SQLite cache: η εγγραφή παραλείφθηκε', exc_info=True)
+            if db is not None and db.in_transaction:
+                db.rollback()  # αλλιώς τα επόμενα get θα διάβαζαν το snapshot της ανοιχτής συναλλαγής
+
+    def get(self, key):
+        try:
+            row = self._db().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            app.logger.warning('SQLite cache: αποτυχία ανάγνωσης, miss', exc_info=True)
+            return None
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        self._write('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), time.time() + ttl))
+
+    def delete(self, key):
+        self._write('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        self._write("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+def _make_cache():
+    if os.environ.get('CACHE_BACKEND', 'memory').lower() == 'sqlite':
+        return SQLiteCache(os.environ.get('CACHE_PATH') or DB_PATH + '.cache')
+    return LRUCache(int(os.environ.get('CACHE_SIZE', 1024)))
+
+
+cache = _make_cache()
+
+SIDEBAR_CACHE_TTL = int(os.environ.get('SIDEBAR_CACHE_TTL', 300))
+
+
+def invalidate_sidebar(user_id=None, role=None):
+    """Ακύρωση της cache του sidebar για έναν χρήστη, ή για όλους αν δεν δοθεί χρήστης."""
+    if user_id is None:
+        cache.delete_prefix('sidebar:')
+    else:
+        cache.delete('sidebar:{}:{}'.format(role, user_id))
 
 
 def allowed_file(filename):
@@ -104,6 +1127,31 @@ def instructor_required(f):
     return decorated_function
 
 
+def conditional_course_response(f):
+    """Decorator: weak ETag για σελίδες μαθήματος· αν ταιριάζει με το If-None-Match απαντά 304 χωρίς render.
+
+    Το ETag προκύπτει από τον χρήστη, το φίλτρο εξαμήνου (sidebar) και τις εκδόσεις δεδομένων
+    του μαθήματος και των μαθημάτων του χρήστη, οπότε κάθε εγγραφή σε αυτά το αλλάζει.
+    """
+    @wraps(f)
+    def decorated_function(*args, course_id=None, **kwargs):
+        # Με εκκρεμή flash μηνύματα η σελίδα πρέπει να αποδοθεί ώστε να εμφανιστούν
+        if request.method != 'GET' or session.get('_flashes'):
+            return f(*args, course_id=course_id, **kwargs)
+        stamp = course_data_stamp(get_db(), session['user_id'], session['role'], course_id)
+        etag = hashlib.sha1('{}:{}:{}:{}:{}'.format(
+            session['user_id'], session['role'], session.get('full_name', ''),
+            session.get('semester_filter') or '', stamp).encode()).hexdigest()[:20]
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, course_id=course_id, **kwargs))
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+
 # Context processor - user data σε ολα τα templates
 
 @app.context_processor
@@ -123,19 +1171,22 @@ def inject_user():
 
 @app.context_processor
 def inject_sidebar_courses():
-    """Λίστα μαθημάτων για το sidebar (φιλτραρισμένα ανά εξάμηνο). Μία query, filter και semesters στο Python."""
+    """Λίστα μαθημάτων για το sidebar (φιλτραρισμένα ανά εξάμηνο). Από cache ανά (χρήστη, ρόλο)· filter και semesters στο Python."""
     if 'user_id' not in session:
         return {'sidebar_courses': [], 'current_course_id_nav': None, 'sidebar_semesters': [], 'current_semester_filter': None}
-    db = get_db()
     role = session.get('role')
     sem_filter = session.get('semester_filter')
-    if role == 'instructor':
-        rows = db.execute('SELECT id, name, semester FROM courses WHERE instructor_id = ? ORDER BY name', (session['user_id'],)).fetchall()
-    else:
-        rows = db.execute('''SELECT c.id, c.name, c.semester FROM courses c
-               JOIN enrollments e ON c.id = e.course_id WHERE e.student_id = ? ORDER BY c.name''', (session['user_id'],)).fetchall()
-    db.close()
-    all_courses = [dict(r) for r in rows]
+    cache_key = 'sidebar:{}:{}'.format(role, session['user_id'])
+    all_courses = cache.get(cache_key)
+    if all_courses is None:
+        db = get_db()
+        if role == 'instructor':
+            rows = db.execute('SELECT id, name, semester FROM courses WHERE instructor_id = ? ORDER BY name', (session['user_id'],)).fetchall()
+        else:
+            rows = db.execute('''SELECT c.id, c.name, c.semester FROM courses c
+                   JOIN enrollments e ON c.id = e.course_id WHERE e.student_id = ? ORDER BY c.name''', (session['user_id'],)).fetchall()
+        all_courses = [dict(r) for r in rows]
+        cache.set(cache_key, all_courses, SIDEBAR_CACHE_TTL)
     if sem_filter:
         courses = [c for c in all_courses if c.get('semester') == sem_filter or not c.get('semester')]
     else:
@@ -148,12 +1199,22 @@ def inject_sidebar_courses():
 
 # Αρχικοποιηση βασης δεδομενων - δημιουργια tables και demo data
 
+# Hashes των (δημόσιων) demo κωδικών, υπολογισμένα εκ των προτέρων με generate_password_hash: το scrypt
+# κοστίζει ~100 ms ανά κλήση και σε Vercel κάθε ψυχρή εκκίνηση ξεκινά με άδεια βάση στο /tmp.
+DEMO_PASSWORD_HASHES = {
+    'teacher123': 'scrypt:32768:8:1$uwxvS44ScegD7uzC$8e77b022c8619dfcdd70e3431ba24e1c13d71643155d63699b8786da2bf6783d'
+                  '771e8d97e3ab5e0e7bd2300a91f28d2511028542459664797c9d11f219e5e761',
+    'student123': 'scrypt:32768:8:1$u1DtkiEpt0PrUh1N$30b90af6d252b0928c371b5d62b636508852997afe5db303dc0fd9a77e6ad338'
+                  '639e3bbe32e7698b4908f9eaaa689cdf97c2c66c2b3ca984c1b6691cc7f960a8',
+}
+
+
 def init_db():
-    """Δημιουργία πινάκων και εισαγωγή αρχικών δεδομένων"""
+    """Δημιουργία πινάκων και εισαγωγή αρχικών δεδομένων (μέσα στη συναλλαγή του prepare_db, χωρίς commit)"""
     db = get_db()
 
-    # Δημιουργία πινάκων
-    db.executescript('''
+    # Δημιουργία πινάκων (εντολή-εντολή: το executescript θα έκανε commit και θα άφηνε το lock)
+    for statement in _sql_statements('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -305,28 +1366,29 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (course_id) REFERENCES courses(id)
         );
-    ''')
+    '''):
+        db.execute(statement)
 
     # Migration: add semester to courses if missing
     try:
         has_semester = db.execute("SELECT COUNT(*) FROM pragma_table_info('courses') WHERE name='semester'").fetchone()[0]
         if has_semester == 0:
             db.execute("ALTER TABLE courses ADD COLUMN semester TEXT DEFAULT 'Εαρινό 2025-2026'")
-            db.commit()
     except Exception:
         pass
 
+    apply_schema_migrations(db)
+
     # Έλεγχος αν υπάρχουν ήδη δεδομένα
     existing = db.execute('SELECT COUNT(*) FROM users').fetchone()[0]
     if existing > 0:
-        db.close()
         return
 
     # Εισαγωγή demo δεδομένων
 
     # Χρήστες
-    instructor_pw = generate_password_hash('teacher123')
-    student_pw = generate_password_hash('student123')
+    instructor_pw = DEMO_PASSWORD_HASHES['teacher123']
+    student_pw = DEMO_PASSWORD_HASHES['student123']
 
     db.execute('''INSERT INTO users (username, password, full_name, email, role)
                   VALUES (?, ?, ?, ?, ?)''',
@@ -650,11 +1712,600 @@ def init_db():
                (1, 'Εξεταστική Περίοδος', 'Τελικές εξετάσεις μαθήματος',
                 '2026-06-15', 'exam'))
 
-    db.commit()
-    db.close()
     print("Η βάση δεδομένων αρχικοποιήθηκε επιτυχώς με demo δεδομένα!")
 
 
+# Μετρητές ανά μάθημα / φοιτητή / συζήτηση, ώστε οι αναγνώσεις να μην ξαναμετρούν όλες τις γραμμές.
+# Τους ενημερώνουν triggers σε κάθε εγγραφή (enroll, υποβολή, βαθμολόγηση, τεστ, δημοσιεύσεις)·
+# το COUNTERS_REBUILD_SQL τους ξαναϋπολογίζει από την αρχή (flask --app app rebuild-counters).
+COUNTERS_SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS course_counters (
+        course_id INTEGER PRIMARY KEY,
+        students INTEGER NOT NULL DEFAULT 0,
+        materials INTEGER NOT NULL DEFAULT 0,
+        assignments INTEGER NOT NULL DEFAULT 0,
+        tests INTEGER NOT NULL DEFAULT 0,
+        discussions INTEGER NOT NULL DEFAULT 0,
+        submissions INTEGER NOT NULL DEFAULT 0,
+        graded INTEGER NOT NULL DEFAULT 0,
+        grade_sum REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (course_id) REFERENCES courses(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS student_counters (
+        student_id INTEGER PRIMARY KEY,
+        submissions INTEGER NOT NULL DEFAULT 0,
+        grade_pct_sum REAL NOT NULL DEFAULT 0,
+        grade_pct_count INTEGER NOT NULL DEFAULT 0,
+        test_attempts INTEGER NOT NULL DEFAULT 0,
+        test_pct_sum REAL NOT NULL DEFAULT 0,
+        test_pct_count INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS discussion_counters (
+        discussion_id INTEGER PRIMARY KEY,
+        post_count INTEGER NOT NULL DEFAULT 0,
+        last_post TIMESTAMP,
+        FOREIGN KEY (discussion_id) REFERENCES discussions(id)
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_courses_ai AFTER INSERT ON courses BEGIN
+        INSERT OR IGNORE INTO course_counters (course_id) VALUES (NEW.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_enrollments_ai AFTER INSERT ON enrollments BEGIN
+        INSERT INTO course_counters (course_id, students) VALUES (NEW.course_id, 1)
+            ON CONFLICT(course_id) DO UPDATE SET students = students + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_enrollments_ad AFTER DELETE ON enrollments BEGIN
+        UPDATE course_counters SET students = students - 1 WHERE course_id = OLD.course_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_materials_ai AFTER INSERT ON materials BEGIN
+        INSERT INTO course_counters (course_id, materials) VALUES (NEW.course_id, 1)
+            ON CONFLICT(course_id) DO UPDATE SET materials = materials + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_materials_ad AFTER DELETE ON materials BEGIN
+        UPDATE course_counters SET materials = materials - 1 WHERE course_id = OLD.course_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_assignments_ai AFTER INSERT ON assignments BEGIN
+        INSERT INTO course_counters (course_id, assignments) VALUES (NEW.course_id, 1)
+            ON CONFLICT(course_id) DO UPDATE SET assignments = assignments + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_assignments_ad AFTER DELETE ON assignments BEGIN
+        UPDATE course_counters SET assignments = assignments - 1 WHERE course_id = OLD.course_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_tests_ai AFTER INSERT ON tests BEGIN
+        INSERT INTO course_counters (course_id, tests) VALUES (NEW.course_id, 1)
+            ON CONFLICT(course_id) DO UPDATE SET tests = tests + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_tests_ad AFTER DELETE ON tests BEGIN
+        UPDATE course_counters SET tests = tests - 1 WHERE course_id = OLD.course_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_discussions_ai AFTER INSERT ON discussions BEGIN
+        INSERT INTO course_counters (course_id, discussions) VALUES (NEW.course_id, 1)
+            ON CONFLICT(course_id) DO UPDATE SET discussions = discussions + 1;
+        INSERT OR IGNORE INTO discussion_counters (discussion_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_discussions_ad AFTER DELETE ON discussions BEGIN
+        UPDATE course_counters SET discussions = discussions - 1 WHERE course_id = OLD.course_id;
+        DELETE FROM discussion_counters WHERE discussion_id = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_posts_ai AFTER INSERT ON discussion_posts BEGIN
+        INSERT INTO discussion_counters (discussion_id, post_count, last_post) VALUES (NEW.discussion_id, 1, NEW.created_at)
+            ON CONFLICT(discussion_id) DO UPDATE SET post_count = post_count + 1,
+                last_post = MAX(COALESCE(last_post, ''), NEW.created_at);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_posts_ad AFTER DELETE ON discussion_posts BEGIN
+        UPDATE discussion_counters SET post_count = post_count - 1,
+            last_post = (SELECT MAX(created_at) FROM discussion_posts WHERE discussion_id = OLD.discussion_id)
+        WHERE discussion_id = OLD.discussion_id;
+    END;
+
+    -- Υποβολές: +1 υποβολή, και συνεισφορά του βαθμού (αν υπάρχει) στα αθροίσματα των μέσων όρων
+    CREATE TRIGGER IF NOT EXISTS trg_submissions_ai AFTER INSERT ON assignment_submissions BEGIN
+        INSERT INTO course_counters (course_id, submissions, graded, grade_sum)
+            SELECT course_id, 1, NEW.grade IS NOT NULL, COALESCE(NEW.grade, 0) FROM assignments WHERE id = NEW.assignment_id
+            ON CONFLICT(course_id) DO UPDATE SET submissions = submissions + 1,
+                graded = graded + excluded.graded, grade_sum = grade_sum + excluded.grade_sum;
+        INSERT INTO student_counters (student_id, submissions, grade_pct_sum, grade_pct_count)
+            SELECT NEW.student_id, 1, COALESCE(NEW.grade * 100.0 / NULLIF(max_grade, 0), 0),
+                   NEW.grade * 100.0 / NULLIF(max_grade, 0) IS NOT NULL
+            FROM assignments WHERE id = NEW.assignment_id
+            ON CONFLICT(student_id) DO UPDATE SET submissions = submissions + 1,
+                grade_pct_sum = grade_pct_sum + excluded.grade_pct_sum,
+                grade_pct_count = grade_pct_count + excluded.grade_pct_count;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_submissions_au AFTER UPDATE OF grade ON assignment_submissions BEGIN
+        UPDATE course_counters
+            SET graded = graded + (NEW.grade IS NOT NULL) - (OLD.grade IS NOT NULL),
+                grade_sum = grade_sum + COALESCE(NEW.grade, 0) - COALESCE(OLD.grade, 0)
+            WHERE course_id = (SELECT course_id FROM assignments WHERE id = NEW.assignment_id);
+        UPDATE student_counters
+            SET grade_pct_sum = grade_pct_sum
+                    + COALESCE((SELECT NEW.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = NEW.assignment_id), 0)
+                    - COALESCE((SELECT OLD.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = OLD.assignment_id), 0),
+                grade_pct_count = grade_pct_count
+                    + ((SELECT NEW.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = NEW.assignment_id) IS NOT NULL)
+                    - ((SELECT OLD.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = OLD.assignment_id) IS NOT NULL)
+            WHERE student_id = NEW.student_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_submissions_ad AFTER DELETE ON assignment_submissions BEGIN
+        UPDATE course_counters
+            SET submissions = submissions - 1,
+                graded = graded - (OLD.grade IS NOT NULL),
+                grade_sum = grade_sum - COALESCE(OLD.grade, 0)
+            WHERE course_id = (SELECT course_id FROM assignments WHERE id = OLD.assignment_id);
+        UPDATE student_counters
+            SET submissions = submissions - 1,
+                grade_pct_sum = grade_pct_sum
+                    - COALESCE((SELECT OLD.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = OLD.assignment_id), 0),
+                grade_pct_count = grade_pct_count
+                    - ((SELECT OLD.grade * 100.0 / NULLIF(max_grade, 0) FROM assignments WHERE id = OLD.assignment_id) IS NOT NULL)
+            WHERE student_id = OLD.student_id;
+    END;
+
+    -- Απόπειρες τεστ: ο μέσος όρος μετρά μόνο όσες έχουν score και max_score > 0
+    CREATE TRIGGER IF NOT EXISTS trg_attempts_ai AFTER INSERT ON test_attempts BEGIN
+        INSERT INTO student_counters (student_id, test_attempts, test_pct_sum, test_pct_count)
+            VALUES (NEW.student_id, 1,
+                    CASE WHEN NEW.max_score > 0 THEN COALESCE(NEW.score * 100.0 / NEW.max_score, 0) ELSE 0 END,
+                    NEW.max_score > 0 AND NEW.score IS NOT NULL)
+            ON CONFLICT(student_id) DO UPDATE SET test_attempts = test_attempts + 1,
+                test_pct_sum = test_pct_sum + excluded.test_pct_sum,
+                test_pct_count = test_pct_count + excluded.test_pct_count;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_attempts_au AFTER UPDATE OF score, max_score ON test_attempts BEGIN
+        UPDATE student_counters
+            SET test_pct_sum = test_pct_sum
+                    + CASE WHEN NEW.max_score > 0 THEN COALESCE(NEW.score * 100.0 / NEW.max_score, 0) ELSE 0 END
+                    - CASE WHEN OLD.max_score > 0 THEN COALESCE(OLD.score * 100.0 / OLD.max_score, 0) ELSE 0 END,
+                test_pct_count = test_pct_count
+                    + (NEW.max_score > 0 AND NEW.score IS NOT NULL)
+                    - (OLD.max_score > 0 AND OLD.score IS NOT NULL)
+            WHERE student_id = NEW.student_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_attempts_ad AFTER DELETE ON test_attempts BEGIN
+        UPDATE student_counters
+            SET test_attempts = test_attempts - 1,
+                test_pct_sum = test_pct_sum
+                    - CASE WHEN OLD.max_score > 0 THEN COALESCE(OLD.score * 100.0 / OLD.max_score, 0) ELSE 0 END,
+                test_pct_count = test_pct_count - (OLD.max_score > 0 AND OLD.score IS NOT NULL)
+            WHERE student_id = OLD.student_id;
+    END;
+'''
+
+COUNTERS_REBUILD_SQL = '''
+    DELETE FROM course_counters;
+    INSERT INTO course_counters (course_id, students, materials, assignments, tests, discussions,
+                                 submissions, graded, grade_sum)
+    SELECT c.id,
+           (SELECT COUNT(*) FROM enrollments WHERE course_id = c.id),
+           (SELECT COUNT(*) FROM materials WHERE course_id = c.id),
+           (SELECT COUNT(*) FROM assignments WHERE course_id = c.id),
+           (SELECT COUNT(*) FROM tests WHERE course_id = c.id),
+           (SELECT COUNT(*) FROM discussions WHERE course_id = c.id),
+           (SELECT COUNT(*) FROM assignment_submissions s JOIN assignments a ON s.assignment_id = a.id
+            WHERE a.course_id = c.id),
+           (SELECT COUNT(s.grade) FROM assignment_submissions s JOIN assignments a ON s.assignment_id = a.id
+            WHERE a.course_id = c.id),
+           (SELECT COALESCE(SUM(s.grade), 0) FROM assignment_submissions s JOIN assignments a ON s.assignment_id = a.id
+            WHERE a.course_id = c.id)
+    FROM courses c;
+
+    DELETE FROM student_counters;
+    INSERT INTO student_counters (student_id, submissions, grade_pct_sum, grade_pct_count,
+                                  test_attempts, test_pct_sum, test_pct_count)
+    SELECT u.id,
+           (SELECT COUNT(*) FROM assignment_submissions WHERE student_id = u.id),
+           (SELECT COALESCE(SUM(s.grade * 100.0 / NULLIF(a.max_grade, 0)), 0) FROM assignment_submissions s
+            JOIN assignments a ON s.assignment_id = a.id WHERE s.student_id = u.id),
+           (SELECT COUNT(s.grade * 100.0 / NULLIF(a.max_grade, 0)) FROM assignment_submissions s
+            JOIN assignments a ON s.assignment_id = a.id WHERE s.student_id = u.id),
+           (SELECT COUNT(*) FROM test_attempts WHERE student_id = u.id),
+           (SELECT COALESCE(SUM(score * 100.0 / max_score), 0) FROM test_attempts
+            WHERE student_id = u.id AND max_score > 0),
+           (SELECT COUNT(score) FROM test_attempts WHERE student_id = u.id AND max_score > 0)
+    FROM users u WHERE u.role = 'student';
+
+    DELETE FROM discussion_counters;
+    INSERT INTO discussion_counters (discussion_id, post_count, last_post)
+    SELECT d.id,
+           (SELECT COUNT(*) FROM discussion_posts WHERE discussion_id = d.id),
+           (SELECT MAX(created_at) FROM discussion_posts WHERE discussion_id = d.id)
+    FROM discussions d;
+'''
+
+
+# Πίνακες με δεδομένα μαθήματος και πώς βρίσκεται το μάθημα μιας γραμμής τους ({row} = NEW ή OLD).
+# Κάθε εγγραφή σε αυτούς αυξάνει το course_counters.version του μαθήματος.
+COURSE_DATA_TABLES = (
+    ('enrollments', '{row}.course_id'),
+    ('materials', '{row}.course_id'),
+    ('announcements', '{row}.course_id'),
+    ('assignments', '{row}.course_id'),
+    ('tests', '{row}.course_id'),
+    ('events', '{row}.course_id'),
+    ('discussions', '{row}.course_id'),
+    ('courses', '{row}.id'),
+    ('assignment_submissions', '(SELECT course_id FROM assignments WHERE id = {row}.assignment_id)'),
+    ('test_attempts', '(SELECT course_id FROM tests WHERE id = {row}.test_id)'),
+    ('discussion_posts', '(SELECT course_id FROM discussions WHERE id = {row}.discussion_id)'),
+)
+
+COURSE_VERSION_SQL = 'ALTER TABLE course_counters ADD COLUMN version INTEGER NOT NULL DEFAULT 0;\n' + '\n'.join(
+    '''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{op} AFTER {event} ON {table} BEGIN
+        UPDATE course_counters SET version = version + 1 WHERE course_id = {course};
+    END;'''.format(table=table, op=event[0].lower(), event=event,
+                    course=course.format(row='OLD' if event == 'DELETE' else 'NEW'))
+    for table, course in COURSE_DATA_TABLES for event in ('INSERT', 'UPDATE', 'DELETE')
+    if not (table == 'courses' and event == 'INSERT'))
+
+# --- Αναζήτηση πλήρους κειμένου (FTS5) ---
+# Ένας πίνακας search_index για υλικό, ανακοινώσεις, συζητήσεις και απαντήσεις. Το rowid κωδικοποιεί
+# πηγή και γραμμή (id * 4 + θέση στο SEARCH_SOURCES) και κρατείται συγχρονισμένο με triggers.
+# Ο tokenizer unicode61 κάνει case folding και αφαιρεί λατινικούς τόνους αλλά όχι ελληνικούς, οπότε
+# το κείμενο αποθηκεύεται ήδη χωρίς τόνους/διαλυτικά (GREEK_FOLD) και το ίδιο γίνεται στο query.
+GREEK_FOLD = {
+    'ά': 'α', 'έ': 'ε', 'ή': 'η', 'ί': 'ι', 'ό': 'ο', 'ύ': 'υ', 'ώ': 'ω',
+    'ϊ': 'ι', 'ϋ': 'υ', 'ΐ': 'ι', 'ΰ': 'υ', 'ς': 'σ',
+    'Ά': 'Α', 'Έ': 'Ε', 'Ή': 'Η', 'Ί': 'Ι', 'Ό': 'Ο', 'Ύ': 'Υ', 'Ώ': 'Ω', 'Ϊ': 'Ι', 'Ϋ': 'Υ',
+}
+_GREEK_FOLD_TABLE = str.maketrans(GREEK_FOLD)
+
+# (είδος, πίνακας, τίτλος, κείμενο, μάθημα, στήλες που αλλάζουν την εγγραφή)· {row} = NEW, OLD ή alias
+SEARCH_SOURCES = (
+    ('material', 'materials', '{row}.title', "COALESCE({row}.description, '')", '{row}.course_id',
+     'title, description, course_id'),
+    ('announcement', 'announcements', '{row}.title', '{row}.content', '{row}.course_id',
+     'title, content, course_id'),
+    ('discussion', 'discussions', '{row}.title', "''", '{row}.course_id', 'title, course_id'),
+    ('post', 'discussion_posts', "''", '{row}.content',
+     '(SELECT course_id FROM discussions WHERE id = {row}.discussion_id)', 'content, discussion_id'),
+)
+
+
+def fold_text(text):
+    """Κείμενο χωρίς ελληνικούς τόνους/διαλυτικά και τελικό σίγμα (όπως αποθηκεύεται στο search_index)."""
+    return unicodedata.normalize('NFC', text).translate(_GREEK_FOLD_TABLE)
+
+
+def _fold_sql(expr):
+    """Το fold_text ως έκφραση SQL (εμφωλευμένα REPLACE), ώστε τα triggers να μη χρειάζονται Python."""
+    if expr == "''":
+        return expr
+    for accented, plain in GREEK_FOLD.items():
+        expr = "REPLACE({}, '{}', '{}')".format(expr, accented, plain)
+    return expr
+
+
+def _search_values_sql(index, row):
+    """Οι τιμές (rowid, title, body, course_id) του search_index για τη γραμμή {row} της πηγής index."""
+    _, _, title, body, course, _ = SEARCH_SOURCES[index]
+    return '{row}.id * 4 + {index}, {title}, {body}, {course}'.format(
+        row=row, index=index, title=_fold_sql(title.format(row=row)),
+        body=_fold_sql(body.format(row=row)), course=course.format(row=row))
+
+
+SEARCH_SCHEMA_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, course_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(4.0, 1.0)');
+''' + '\n'.join(
+    '''CREATE TRIGGER IF NOT EXISTS trg_{table}_search_i AFTER INSERT ON {table} BEGIN
+        INSERT INTO search_index (rowid, title, body, course_id) VALUES ({values});
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_search_u AFTER UPDATE OF {columns} ON {table} BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + {index};
+        INSERT INTO search_index (rowid, title, body, course_id) VALUES ({values});
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_search_d AFTER DELETE ON {table} BEGIN
+        DELETE FROM search_index WHERE rowid = OLD.id * 4 + {index};
+    END;'''.format(table=table, columns=columns, index=index, values=_search_values_sql(index, 'NEW'))
+    for index, (_, table, _, _, _, columns) in enumerate(SEARCH_SOURCES))
+
+SEARCH_REBUILD_SQL = 'DELETE FROM search_index;\n' + '\n'.join(
+    'INSERT INTO search_index (rowid, title, body, course_id) SELECT {} FROM {} t;'.format(
+        _search_values_sql(index, 't'), table)
+    for index, (_, table, _, _, _, _) in enumerate(SEARCH_SOURCES))
+
+# Βαθμολόγιο: μία γραμμή ανά (μάθημα, φοιτητής, εργασία ή τεστ) με βαθμό, μέγιστο και ποσοστό
+# (grade * 100.0 / max_grade, όπως στο dashboard). Τα triggers το ενημερώνουν σε κάθε υποβολή,
+# βαθμολόγηση (grade_submission) και ολοκληρωμένο τεστ (take_test, και από την ουρά υποβολών)·
+# το GRADEBOOK_REBUILD_SQL το ξαναχτίζει από την αρχή (flask --app app rebuild-gradebook).
+_GRADEBOOK_SUBMISSION_SQL = '''
+        INSERT OR REPLACE INTO gradebook (course_id, student_id, item_type, item_id, score, max_score, percent, updated_at)
+        SELECT course_id, NEW.student_id, 'assignment', id, NEW.grade, max_grade,
+               NEW.grade * 100.0 / NULLIF(max_grade, 0), CURRENT_TIMESTAMP
+        FROM assignments WHERE id = NEW.assignment_id;'''
+_GRADEBOOK_ATTEMPT_SQL = '''
+        INSERT OR REPLACE INTO gradebook (course_id, student_id, item_type, item_id, score, max_score, percent, updated_at)
+        SELECT course_id, NEW.student_id, 'test', id, NEW.score, NEW.max_score,
+               NEW.score * 100.0 / NULLIF(NEW.max_score, 0), CURRENT_TIMESTAMP
+        FROM tests WHERE id = NEW.test_id;'''
+# Η γραμμή του τεστ από την τελευταία ολοκληρωμένη απόπειρα (ή καμία), μετά από αλλαγή/διαγραφή απόπειρας
+_GRADEBOOK_LATEST_ATTEMPT_SQL = '''
+        DELETE FROM gradebook WHERE item_type = 'test' AND item_id = {row}.test_id AND student_id = {row}.student_id;
+        INSERT INTO gradebook (course_id, student_id, item_type, item_id, score, max_score, percent)
+        SELECT t.course_id, ta.student_id, 'test', t.id, ta.score, ta.max_score, ta.score * 100.0 / NULLIF(ta.max_score, 0)
+        FROM test_attempts ta JOIN tests t ON t.id = ta.test_id
+        WHERE ta.test_id = {row}.test_id AND ta.student_id = {row}.student_id AND ta.completed_at IS NOT NULL
+        ORDER BY ta.completed_at DESC, ta.id DESC LIMIT 1;'''
+GRADEBOOK_ATTEMPTS_AU_SQL = '''
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_attempts_au AFTER UPDATE OF score, max_score, completed_at ON test_attempts
+    BEGIN{latest}
+    END;
+'''.format(latest=_GRADEBOOK_LATEST_ATTEMPT_SQL.format(row='NEW'))
+
+GRADEBOOK_SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS gradebook (
+        course_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        item_type TEXT NOT NULL CHECK(item_type IN ('assignment', 'test')),
+        item_id INTEGER NOT NULL,
+        score REAL,
+        max_score REAL,
+        percent REAL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (course_id, student_id, item_type, item_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_gradebook_item ON gradebook(item_type, item_id, student_id);
+
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_submissions_ai AFTER INSERT ON assignment_submissions BEGIN{submission}
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_submissions_au AFTER UPDATE OF grade ON assignment_submissions BEGIN{submission}
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_submissions_ad AFTER DELETE ON assignment_submissions BEGIN
+        DELETE FROM gradebook
+        WHERE item_type = 'assignment' AND item_id = OLD.assignment_id AND student_id = OLD.student_id;
+    END;
+
+    -- Μόνο ολοκληρωμένες απόπειρες· αν υπάρχουν περισσότερες, μετρά η τελευταία
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_attempts_ai AFTER INSERT ON test_attempts
+    WHEN NEW.completed_at IS NOT NULL BEGIN{attempt}
+    END;
+{attempts_au}    CREATE TRIGGER IF NOT EXISTS trg_gradebook_attempts_ad AFTER DELETE ON test_attempts BEGIN{latest_old}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_assignments_au AFTER UPDATE OF max_grade ON assignments BEGIN
+        UPDATE gradebook SET max_score = NEW.max_grade, percent = score * 100.0 / NULLIF(NEW.max_grade, 0)
+        WHERE item_type = 'assignment' AND item_id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_assignments_ad AFTER DELETE ON assignments BEGIN
+        DELETE FROM gradebook WHERE item_type = 'assignment' AND item_id = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_gradebook_tests_ad AFTER DELETE ON tests BEGIN
+        DELETE FROM gradebook WHERE item_type = 'test' AND item_id = OLD.id;
+    END;
+'''.format(submission=_GRADEBOOK_SUBMISSION_SQL, attempt=_GRADEBOOK_ATTEMPT_SQL,
+           attempts_au=GRADEBOOK_ATTEMPTS_AU_SQL, latest_old=_GRADEBOOK_LATEST_ATTEMPT_SQL.format(row='OLD'))
+
+GRADEBOOK_REBUILD_SQL = '''
+    DELETE FROM gradebook;
+    INSERT INTO gradebook (course_id, student_id, item_type, item_id, score, max_score, percent)
+    SELECT a.course_id, s.student_id, 'assignment', a.id, s.grade, a.max_grade, s.grade * 100.0 / NULLIF(a.max_grade, 0)
+    FROM assignment_submissions s JOIN assignments a ON a.id = s.assignment_id;
+    INSERT OR REPLACE INTO gradebook (course_id, student_id, item_type, item_id, score, max_score, percent)
+    SELECT t.course_id, ta.student_id, 'test', t.id, ta.score, ta.max_score, ta.score * 100.0 / NULLIF(ta.max_score, 0)
+    FROM test_attempts ta JOIN tests t ON t.id = ta.test_id
+    WHERE ta.completed_at IS NOT NULL
+    ORDER BY ta.completed_at, ta.id;
+'''
+
+# Αλλαγές σχήματος με έκδοση. Κάθε έκδοση εφαρμόζεται μία φορά (η τρέχουσα αποθηκεύεται
+# στο PRAGMA user_version)· νέες αλλαγές = νέα έκδοση στο τέλος της λίστας.
+SCHEMA_MIGRATIONS = [
+    # Ευρετήρια για τις συχνές αναζητήσεις ανά foreign key
+    (1, '''
+        CREATE INDEX IF NOT EXISTS idx_courses_instructor ON courses(instructor_id, name);
+        CREATE INDEX IF NOT EXISTS idx_enrollments_student ON enrollments(student_id, course_id);
+        CREATE INDEX IF NOT EXISTS idx_materials_course ON materials(course_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_announcements_course ON announcements(course_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_assignments_course ON assignments(course_id, due_date);
+        CREATE INDEX IF NOT EXISTS idx_submissions_student ON assignment_submissions(student_id, assignment_id);
+        CREATE INDEX IF NOT EXISTS idx_tests_course ON tests(course_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_test_questions_test ON test_questions(test_id);
+        CREATE INDEX IF NOT EXISTS idx_test_attempts_test ON test_attempts(test_id, student_id, completed_at);
+        CREATE INDEX IF NOT EXISTS idx_test_attempts_student ON test_attempts(student_id, completed_at);
+        CREATE INDEX IF NOT EXISTS idx_test_answers_attempt ON test_answers(attempt_id);
+        CREATE INDEX IF NOT EXISTS idx_discussions_course ON discussions(course_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_discussion_posts_discussion ON discussion_posts(discussion_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_discussion_posts_author ON discussion_posts(author_id, discussion_id);
+        CREATE INDEX IF NOT EXISTS idx_events_course ON events(course_id, event_date);
+    '''),
+    # Μετρητές που ενημερώνονται από triggers
+    (2, COUNTERS_SCHEMA_SQL + COUNTERS_REBUILD_SQL),
+    # Έκδοση δεδομένων ανά μάθημα (για ακύρωση της cache του dashboard)
+    (3, COURSE_VERSION_SQL),
+    # Τμηματικά (resumable) uploads σε εξέλιξη
+    (4, '''
+        CREATE TABLE IF NOT EXISTS uploads (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK(kind IN ('material', 'submission')),
+            target_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            received INTEGER NOT NULL DEFAULT 0,
+            metadata TEXT,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_uploads_created ON uploads(created_at);
+    '''),
+    # Αποθήκη αρχείων κατά περιεχόμενο: file_path (λογικό όνομα) -> blob (SHA-256), με μετρητή αναφορών
+    (5, '''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            FOREIGN KEY (sha256) REFERENCES blobs(sha256)
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
+        CREATE INDEX IF NOT EXISTS idx_blobs_refcount ON blobs(refcount);
+
+        CREATE TRIGGER IF NOT EXISTS trg_files_ai AFTER INSERT ON files BEGIN
+            UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.sha256;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_files_ad AFTER DELETE ON files BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.sha256;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_materials_files_ad AFTER DELETE ON materials
+        WHEN OLD.file_path IS NOT NULL BEGIN
+            DELETE FROM files WHERE name = OLD.file_path;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_submissions_files_ad AFTER DELETE ON assignment_submissions
+        WHEN OLD.file_path IS NOT NULL BEGIN
+            DELETE FROM files WHERE name = OLD.file_path;
+        END;
+    '''),
+    # Εύρεση του υλικού/της υποβολής ενός αρχείου για τον έλεγχο πρόσβασης στο download
+    (6, '''
+        CREATE INDEX IF NOT EXISTS idx_materials_file ON materials(file_path);
+        CREATE INDEX IF NOT EXISTS idx_submissions_file ON assignment_submissions(file_path);
+    '''),
+    # Αναζήτηση πλήρους κειμένου: search_index (FTS5), triggers συγχρονισμού και αρχικό γέμισμα
+    (7, SEARCH_SCHEMA_SQL + SEARCH_REBUILD_SQL),
+    # Βαθμολόγιο (μάθημα × φοιτητής × εργασία/τεστ) για την εξαγωγή CSV
+    (8, GRADEBOOK_SCHEMA_SQL + GRADEBOOK_REBUILD_SQL),
+    # Βαθμολόγιο: η αλλαγή απόπειρας κρατά την τελευταία ολοκληρωμένη (όπως η διαγραφή) και ξαναχτίσιμο
+    (9, 'DROP TRIGGER IF EXISTS trg_gradebook_attempts_au;' + GRADEBOOK_ATTEMPTS_AU_SQL + GRADEBOOK_REBUILD_SQL),
+]
+
+
+def _sql_statements(script):
+    """Χωρισμός ενός SQL script σε εντολές (τα ';' μέσα σε triggers, strings και σχόλια δεν κόβουν)"""
+    statement = ''
+    for part in script.split(';'):
+        statement += part + ';'
+        if sqlite3.complete_statement(statement):
+            if statement.strip(' \n\t;'):
+                yield statement
+            statement = ''
+
+
+def apply_schema_migrations(db):
+    """Εφαρμογή όσων εκδόσεων του σχήματος δεν έχουν εφαρμοστεί ακόμη.
+
+    Κάθε έκδοση (εντολές + PRAGMA user_version) τρέχει σε ένα BEGIN IMMEDIATE … COMMIT: αν αποτύχει
+    στη μέση γίνεται rollback και η βάση μένει στην προηγούμενη έκδοση. Το executescript κάνει commit
+    πριν τρέξει, γι' αυτό οι εντολές εκτελούνται μία μία. Η έκδοση ξαναδιαβάζεται αφού πάρουμε το
+    lock, ώστε μια έκδοση που εφάρμοσε στο μεταξύ άλλος worker να μην τρέξει δεύτερη φορά. Αν ο
+    caller κρατά ήδη το lock (prepare_db), οι εκδόσεις τρέχουν μέσα στη δική του συναλλαγή.
+    """
+    own_transaction = not db.in_transaction
+    for target, script in SCHEMA_MIGRATIONS:
+        if own_transaction:
+            db.execute('BEGIN IMMEDIATE')
+        try:
+            if db.execute('PRAGMA user_version').fetchone()[0] < target:
+                for statement in _sql_statements(script):
+                    db.execute(statement)
+                db.execute('PRAGMA user_version = {}'.format(int(target)))
+            if own_transaction:
+                db.commit()
+        except BaseException:
+            if own_transaction:
+                db.rollback()
+            raise
+
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def prepare_db():
+    """Βάση έτοιμη για χρήση στην εκκίνηση. Επιστρέφει True αν χρειάστηκε αρχικοποίηση/migration.
+
+    Fast path: ένα PRAGMA user_version· αν η βάση είναι ήδη στην τελευταία έκδοση του σχήματος δεν
+    εκτελείται τίποτα άλλο. Διαφορετικά (νέα ή παλαιότερη βάση) journal_mode (μόνιμο στο αρχείο),
+    init_db, migrations και οι διορθώσεις των demo μαθημάτων, μία φορά: όλα σε ένα BEGIN IMMEDIATE …
+    COMMIT, με την έκδοση να ξαναδιαβάζεται αφού πάρουμε το lock. Έτσι workers που ξεκινούν μαζί σε
+    νέα βάση περιμένουν τον πρώτο και βρίσκουν τη βάση έτοιμη (False), αντί να τρέξουν ξανά init/seed.
+    """
+    db = get_db()
+    if db.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    _db_pool.apply_journal_mode()
+    db.commit()
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        if db.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            db.commit()
+            return False
+        init_db()
+        ensure_second_semester_course()
+        ensure_semesters_earino_ximerino()
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    invalidate_sidebar()
+    return True
+
+
+COUNTER_TABLES = ('course_counters', 'student_counters', 'discussion_counters')
+
+
+def rebuild_counters(db):
+    """Ξαναϋπολογισμός όλων των μετρητών. Επιστρέφει ανά πίνακα πόσες γραμμές διέφεραν (έλεγχος συνέπειας)."""
+    def snapshot():
+        return {table: {row[0]: tuple(round(row[k], 6) if isinstance(row[k], float) else row[k]
+                                      for k in row.keys() if k != 'version')
+                        for row in db.execute('SELECT * FROM ' + table).fetchall()}
+                for table in COUNTER_TABLES}
+
+    before = snapshot()
+    # Η έκδοση δεδομένων ανά μάθημα (cache του dashboard) δεν μηδενίζεται: αυξάνεται, ώστε να ακυρωθούν
+    # τα fragments που είχαν γίνει cache με τους παλιούς μετρητές
+    db.executescript('BEGIN; CREATE TEMP TABLE course_versions AS SELECT course_id, version FROM course_counters;'
+                     + COUNTERS_REBUILD_SQL + '''
+        UPDATE course_counters SET version = 1 + COALESCE(
+            (SELECT v.version FROM temp.course_versions v WHERE v.course_id = course_counters.course_id), 0);
+        DROP TABLE temp.course_versions;
+        COMMIT;''')
+    after = snapshot()
+    return {table: sum(1 for key in before[table].keys() | after[table].keys()
+                       if before[table].get(key) != after[table].get(key))
+            for table in COUNTER_TABLES}
+
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Ξαναϋπολογίζει τους μετρητές και αναφέρει όσους είχαν αποκλίνει."""
+    drift = rebuild_counters(get_db())
+    for table, changed in drift.items():
+        print('{}: {} γραμμές διορθώθηκαν'.format(table, changed))
+
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Ξαναχτίζει το search_index από τους πίνακες περιεχομένου (τα triggers το κρατούν ενημερωμένο)."""
+    db = get_db()
+    db.executescript('BEGIN;' + SEARCH_REBUILD_SQL + 'COMMIT;')
+    count = db.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]
+    print('search_index: {} εγγραφές'.format(count))
+
+
+@app.cli.command('rebuild-gradebook')
+def rebuild_gradebook_command():
+    """Ξαναχτίζει το βαθμολόγιο από τις υποβολές και τις απόπειρες (τα triggers το κρατούν ενημερωμένο)."""
+    db = get_db()
+    db.executescript('BEGIN;' + GRADEBOOK_REBUILD_SQL + 'COMMIT;')
+    count = db.execute('SELECT COUNT(*) FROM gradebook').fetchone()[0]
+    print('gradebook: {} εγγραφές'.format(count))
+
+
 # ---------- Routes ----------
 
 @app.route('/')
@@ -674,7 +2325,6 @@ def login():
 
         db = get_db()
         user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        db.close()
 
         if user and check_password_hash(user['password'], password):
             session.permanent = True
@@ -718,7 +2368,6 @@ def register():
         existing = db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
         if existing:
             flash('Το όνομα χρήστη υπάρχει ήδη.', 'danger')
-            db.close()
             return render_template('register.html')
 
         hashed_pw = generate_password_hash(password)
@@ -726,7 +2375,6 @@ def register():
                       VALUES (?, ?, ?, ?, ?)''',
                    (username, hashed_pw, full_name, email, role))
         db.commit()
-        db.close()
 
         flash('Η εγγραφή ολοκληρώθηκε! Μπορείτε τώρα να συνδεθείτε.', 'success')
         return redirect(url_for('login'))
@@ -763,110 +2411,79 @@ def _is_partial_request():
     )
 
 
-def _ensure_calendar_demo_current_month(db, course_ids):
-    """Βάζει 1 event + 1 assignment στον τρέχοντα μήνα αν δεν υπάρχει τίποτα, ώστε να φαίνονται κουκίδες."""
-    if not course_ids:
-        return
-    today = date.today()
-    y, m = today.year, today.month
-    last_day = monthrange(y, m)[1]
-    month_start = '{:04d}-{:02d}-01'.format(y, m)
-    month_end = '{:04d}-{:02d}-{:02d}'.format(y, m, last_day)
-    cid = course_ids[0]
-    has_event = db.execute(
-        'SELECT 1 FROM events WHERE course_id = ? AND event_date >= ? AND event_date <= ? LIMIT 1',
-        (cid, month_start, month_end)
-    ).fetchone()
-    if not has_event:
-        event_day = min(25, last_day)
-        db.execute(
-            '''INSERT INTO events (course_id, title, description, event_date, event_type)
-               VALUES (?, ?, ?, ?, ?)''',
-            (cid, 'Διάλεξη / Ενότητα', 'Δραστηριότητα μαθήματος', '{:04d}-{:02d}-{:02d}'.format(y, m, event_day), 'lecture')
-        )
-    has_assignment = db.execute(
-        'SELECT 1 FROM assignments WHERE course_id = ? AND due_date >= ? AND due_date <= ? LIMIT 1',
-        (cid, month_start, month_end)
-    ).fetchone()
-    if not has_assignment:
-        due_day = min(28, last_day)
-        db.execute(
-            '''INSERT INTO assignments (course_id, title, description, due_date, max_grade)
-               VALUES (?, ?, ?, ?, ?)''',
-            (cid, 'Δραστηριότητα μήνα', 'Δραστηριότητα για το τρέχον μήνα.', '{:04d}-{:02d}-{:02d}'.format(y, m, due_day), 10)
-        )
-    db.commit()
-
-
-def _dashboard_calendar_items(db, user_id, role, semester_filter=None):
-    """Συλλογή γεγονότων και ληξιπρόθεσμων εργασιών για το ημερολόγιο."""
-    today = date.today()
-    end = today + timedelta(days=90)
-    # Για το τρέχον μήνα: ξεκινάμε από την 1η ώστε να εμφανίζονται κουκίδες και για προηγούμενες μέρες
-    first_of_month = date(today.year, today.month, 1)
-    start_str = first_of_month.isoformat()
-    end_str = end.isoformat()
-    items = []
-
+def user_course_ids(db, user_id, role, semester_filter=None):
+    """Ids των μαθημάτων του χρήστη (του εκπαιδευτή ή όσων είναι εγγεγραμμένος), προαιρετικά ανά εξάμηνο."""
     if role == 'instructor':
         sql = 'SELECT id FROM courses WHERE instructor_id = ?'
         params = [user_id]
         if semester_filter:
             sql += ' AND (semester = ? OR semester IS NULL)'
             params.append(semester_filter)
-        course_ids = [r[0] for r in db.execute(sql, params).fetchall()]
     else:
         sql = 'SELECT course_id FROM enrollments e JOIN courses c ON c.id = e.course_id WHERE e.student_id = ?'
         params = [user_id]
         if semester_filter:
             sql += ' AND (c.semester = ? OR c.semester IS NULL)'
             params.append(semester_filter)
-        course_ids = [r[0] for r in db.execute(sql, params).fetchall()]
+    return [r[0] for r in db.execute(sql, params).fetchall()]
 
-    if not course_ids:
-        return [], {}, today.year, today.month, 0, 1
 
-    _ensure_calendar_demo_current_month(db, course_ids)
+def calendar_rows(db, course_ids, start=None, end=None):
+    """Συμβάντα και προθεσμίες εργασιών των μαθημάτων, με ημερομηνία στο [start, end), ταξινομημένα (ένα query).
 
+    Επιστρέφει τον cursor, ώστε ο καλών να διαβάζει τις γραμμές σταδιακά.
+    """
     placeholders = ','.join('?' * len(course_ids))
-    events = db.execute(
-        '''SELECT ev.id, ev.title, ev.event_date, c.name as course_name, c.id as course_id
+    date_range, range_params = '', []
+    if start:
+        date_range += ' AND {col} >= ?'
+        range_params.append(start)
+    if end:
+        date_range += ' AND {col} < ?'
+        range_params.append(end)
+    return db.execute(
+        '''SELECT 'event' AS type, ev.id, ev.title, ev.event_date AS date, ev.description, ev.event_type,
+                  c.id AS course_id, c.name AS course_name
            FROM events ev JOIN courses c ON ev.course_id = c.id
-           WHERE ev.course_id IN ({}) AND ev.event_date >= ? AND ev.event_date <= ?'''
-        .format(placeholders), (*course_ids, start_str, end_str)
-    ).fetchall()
-    for r in events:
-        items.append({
-            'date': r['event_date'][:10] if r['event_date'] else None,
-            'title': r['title'],
-            'type': 'event',
-            'course_name': r['course_name'],
-            'course_id': r['course_id'],
-            'url': None,
-        })
-    assignments = db.execute(
-        '''SELECT a.id, a.title, a.due_date, c.name as course_name, c.id as course_id
+           WHERE ev.course_id IN ({0}){1}
+           UNION ALL
+           SELECT 'assignment', a.id, a.title, a.due_date, a.description, 'deadline',
+                  c.id, c.name
            FROM assignments a JOIN courses c ON a.course_id = c.id
-           WHERE a.course_id IN ({}) AND a.due_date >= ? AND a.due_date <= ?'''
-        .format(placeholders), (*course_ids, start_str, end_str)
-    ).fetchall()
-    for r in assignments:
-        items.append({
-            'date': r['due_date'][:10] if r['due_date'] else None,
-            'title': r['title'],
-            'type': 'assignment',
-            'course_name': r['course_name'],
-            'course_id': r['course_id'],
-            'url': None,
-        })
+           WHERE a.course_id IN ({0}) AND a.due_date IS NOT NULL{2}
+           ORDER BY date, type DESC'''.format(placeholders, date_range.format(col='ev.event_date'),
+                                             date_range.format(col='a.due_date')),
+        (*course_ids, *range_params, *course_ids, *range_params)
+    )
+
+
+def _dashboard_calendar_items(db, user_id, role, semester_filter=None):
+    """Συλλογή γεγονότων και ληξιπρόθεσμων εργασιών για το ημερολόγιο."""
+    today = date.today()
+    end = today + timedelta(days=90)
+    # Για το τρέχον μήνα: ξεκινάμε από την 1η ώστε να εμφανίζονται κουκίδες και για προηγούμενες μέρες
+    first_of_month = date(today.year, today.month, 1)
+    start_str = first_of_month.isoformat()
+    end_str = (end + timedelta(days=1)).isoformat()
+
+    course_ids = user_course_ids(db, user_id, role, semester_filter)
+    if not course_ids:
+        return [], {}, today.year, today.month, 0, 1, []
+
+    items = [{
+        'date': r['date'][:10] if r['date'] else None,
+        'title': r['title'],
+        'type': r['type'],
+        'course_name': r['course_name'],
+        'course_id': r['course_id'],
+        'url': None,
+    } for r in calendar_rows(db, course_ids, start_str, end_str)]
 
     for it in items:
         if it['type'] == 'event':
             it['url'] = url_for('events', course_id=it['course_id'])
         else:
             it['url'] = url_for('assignments', course_id=it['course_id'])
-    items.sort(key=lambda x: x.get('date') or '')
-
     # Calendar grid for current month
     y, m = today.year, today.month
     first = date(y, m, 1)
@@ -881,13 +2498,79 @@ def _dashboard_calendar_items(db, user_id, role, semester_filter=None):
     return items, items_by_date, y, m, days_in_month, first_weekday, calendar_days
 
 
+def course_stats(db, course_ids):
+    """Στατιστικά ανά μάθημα για πολλά μαθήματα μαζί, από τους μετρητές του course_counters (ένα query)."""
+    stats = {cid: {'students': 0, 'materials': 0, 'assignments': 0, 'pending': 0, 'graded': 0,
+                   'tests': 0, 'discussions': 0, 'avg_grade': None} for cid in course_ids}
+    if not course_ids:
+        return stats
+    placeholders = ','.join('?' * len(course_ids))
+    rows = db.execute(
+        'SELECT * FROM course_counters WHERE course_id IN ({})'.format(placeholders), course_ids
+    ).fetchall()
+    for r in rows:
+        avg_grade = r['grade_sum'] / r['graded'] if r['graded'] else None
+        stats[r['course_id']].update({
+            'students': r['students'],
+            'materials': r['materials'],
+            'assignments': r['assignments'],
+            'pending': r['submissions'] - r['graded'],
+            'graded': r['graded'],
+            'tests': r['tests'],
+            'discussions': r['discussions'],
+            'avg_grade': round(avg_grade, 1) if avg_grade else None,
+        })
+    return stats
+
+
+DASHBOARD_FRAGMENT_TTL = int(os.environ.get('DASHBOARD_FRAGMENT_TTL', 600))
+
+
+def course_data_stamp(db, user_id, role, course_id=None):
+    """Σύνοψη των εκδόσεων δεδομένων (course_counters.version) των μαθημάτων του χρήστη και, αν δοθεί, ενός ακόμη μαθήματος."""
+    if role == 'instructor':
+        rows = db.execute(
+            '''SELECT cc.course_id, cc.version FROM courses c
+               JOIN course_counters cc ON cc.course_id = c.id
+               WHERE c.instructor_id = ? ORDER BY cc.course_id''', (user_id,)
+        ).fetchall()
+    else:
+        rows = db.execute(
+            '''SELECT cc.course_id, cc.version FROM enrollments e
+               JOIN course_counters cc ON cc.course_id = e.course_id
+               WHERE e.student_id = ? ORDER BY cc.course_id''', (user_id,)
+        ).fetchall()
+    versions = ['{}:{}'.format(r[0], r[1]) for r in rows]
+    if course_id is not None:
+        row = db.execute('SELECT version FROM course_counters WHERE course_id = ?', (course_id,)).fetchone()
+        versions.append('course={}:{}'.format(course_id, row[0] if row else ''))
+    return hashlib.sha1(','.join(versions).encode()).hexdigest()[:16]
+
+
+def dashboard_fragment_key(db, user_id, role, semester_filter):
+    """Κλειδί cache του dashboard_content: χρήστης, εξάμηνο, ημέρα και έκδοση δεδομένων των μαθημάτων του."""
+    stamp = course_data_stamp(db, user_id, role)
+    return 'dashboard:{}:{}:{}:{}:{}'.format(role, user_id, semester_filter or '', date.today().isoformat(), stamp)
+
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    """Κεντρικός πίνακας ελέγχου"""
+    """Κεντρικός πίνακας ελέγχου. Το περιεχόμενο (και το partial του AJAX) σερβίρεται από cache όσο δεν αλλάζουν τα δεδομένα."""
     db = get_db()
-
     semester_filter = session.get('semester_filter')
+    key = dashboard_fragment_key(db, session['user_id'], session['role'], semester_filter)
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render_template('dashboard_content.html', **_dashboard_context(db, semester_filter))
+        cache.set(key, fragment, DASHBOARD_FRAGMENT_TTL)
+    if _is_partial_request():
+        return fragment
+    return render_template('dashboard.html', dashboard_fragment=fragment)
+
+
+def _dashboard_context(db, semester_filter):
+    """Δεδομένα του dashboard_content.html για τον τρέχοντα χρήστη"""
     if session['role'] == 'instructor':
         sql = 'SELECT * FROM courses WHERE instructor_id = ?'
         params = [session['user_id']]
@@ -897,67 +2580,14 @@ def dashboard():
         sql += ' ORDER BY name'
         courses = db.execute(sql, params).fetchall()
 
-        # Αθροιστικά στατιστικά
-        total_students = 0
-        total_materials = 0
-        total_pending = 0
-        total_submissions = 0
-
-        stats = {}
-        for course in courses:
-            student_count = db.execute(
-                'SELECT COUNT(*) FROM enrollments WHERE course_id = ?', (course['id'],)
-            ).fetchone()[0]
-            material_count = db.execute(
-                'SELECT COUNT(*) FROM materials WHERE course_id = ?', (course['id'],)
-            ).fetchone()[0]
-            assignment_count = db.execute(
-                'SELECT COUNT(*) FROM assignments WHERE course_id = ?', (course['id'],)
-            ).fetchone()[0]
-            pending_submissions = db.execute(
-                '''SELECT COUNT(*) FROM assignment_submissions s
-                   JOIN assignments a ON s.assignment_id = a.id
-                   WHERE a.course_id = ? AND s.grade IS NULL''', (course['id'],)
-            ).fetchone()[0]
-            graded_submissions = db.execute(
-                '''SELECT COUNT(*) FROM assignment_submissions s
-                   JOIN assignments a ON s.assignment_id = a.id
-                   WHERE a.course_id = ? AND s.grade IS NOT NULL''', (course['id'],)
-            ).fetchone()[0]
-            test_count = db.execute(
-                'SELECT COUNT(*) FROM tests WHERE course_id = ?', (course['id'],)
-            ).fetchone()[0]
-            discussion_count = db.execute(
-                'SELECT COUNT(*) FROM discussions WHERE course_id = ?', (course['id'],)
-            ).fetchone()[0]
-            avg_grade = db.execute(
-                '''SELECT AVG(s.grade) FROM assignment_submissions s
-                   JOIN assignments a ON s.assignment_id = a.id
-                   WHERE a.course_id = ? AND s.grade IS NOT NULL''', (course['id'],)
-            ).fetchone()[0]
-
-            total_students += student_count
-            total_materials += material_count
-            total_pending += pending_submissions
-            total_submissions += graded_submissions + pending_submissions
-
-            stats[course['id']] = {
-                'students': student_count,
-                'materials': material_count,
-                'assignments': assignment_count,
-                'pending': pending_submissions,
-                'graded': graded_submissions,
-                'tests': test_count,
-                'discussions': discussion_count,
-                'avg_grade': round(avg_grade, 1) if avg_grade else None,
-            }
-
+        # Αθροιστικά στατιστικά (σταθερός αριθμός queries, ανεξάρτητα από το πλήθος μαθημάτων)
+        stats = course_stats(db, [c['id'] for c in courses])
         overview = {
             'total_courses': len(courses),
-            'total_students': total_students,
-            'total_materials': total_materials,
-            'total_pending': total_pending,
-            'total_submissions': total_submissions,
+            'total_students': sum(st['students'] for st in stats.values()),
+            'total_materials': sum(st['materials'] for st in stats.values()),
+            'total_pending': sum(st['pending'] for st in stats.values()),
+            'total_submissions': sum(st['pending'] + st['graded'] for st in stats.values()),
         }
 
         # Ανακοινώσεις: όταν έχει επιλεγεί εξάμηνο = μόνο από μαθήματα αυτού του εξαμήνου (overview)
@@ -976,14 +2606,10 @@ def dashboard():
         calendar_items, calendar_by_date, cal_year, cal_month, cal_days, cal_first_weekday, cal_days_list = _dashboard_calendar_items(
             db, session['user_id'], session['role'], semester_filter)
         cal_month_name = _CAL_MONTHS_EL[cal_month] if 1 <= cal_month <= 12 else ''
-        db.close()
-        _ctx = dict(courses=courses, stats=stats, overview=overview, announcements=recent_announcements,
+        return dict(courses=courses, stats=stats, overview=overview, announcements=recent_announcements,
                     calendar_items=calendar_items, calendar_by_date=calendar_by_date,
                     cal_year=cal_year, cal_month=cal_month, cal_month_name=cal_month_name,
                     cal_days=cal_days, cal_first_weekday=cal_first_weekday, cal_days_list=cal_days_list)
-        if _is_partial_request():
-            return render_template('dashboard_content.html', **_ctx)
-        return render_template('dashboard.html', **_ctx)
     else:
         sql = '''SELECT c.* FROM courses c
                JOIN enrollments e ON c.id = e.course_id
@@ -1027,26 +2653,14 @@ def dashboard():
                ORDER BY a.due_date ASC''', (session['user_id'], session['user_id'])
         ).fetchall()
 
-        # Στατιστικά φοιτητή
-        total_submitted = db.execute(
-            'SELECT COUNT(*) FROM assignment_submissions WHERE student_id = ?',
-            (session['user_id'],)
-        ).fetchone()[0]
-        avg_grade = db.execute(
-            '''SELECT AVG(s.grade * 100.0 / a.max_grade) FROM assignment_submissions s
-               JOIN assignments a ON s.assignment_id = a.id
-               WHERE s.student_id = ? AND s.grade IS NOT NULL''',
-            (session['user_id'],)
-        ).fetchone()[0]
-        test_attempts = db.execute(
-            'SELECT COUNT(*) FROM test_attempts WHERE student_id = ?',
-            (session['user_id'],)
-        ).fetchone()[0]
-        avg_test = db.execute(
-            '''SELECT AVG(score * 100.0 / max_score)
-               FROM test_attempts WHERE student_id = ? AND max_score > 0''',
-            (session['user_id'],)
-        ).fetchone()[0]
+        # Στατιστικά φοιτητή (μετρητές student_counters)
+        counters = db.execute(
+            'SELECT * FROM student_counters WHERE student_id = ?', (session['user_id'],)
+        ).fetchone()
+        total_submitted = counters['submissions'] if counters else 0
+        test_attempts = counters['test_attempts'] if counters else 0
+        avg_grade = counters['grade_pct_sum'] / counters['grade_pct_count'] if counters and counters['grade_pct_count'] else None
+        avg_test = counters['test_pct_sum'] / counters['test_pct_count'] if counters and counters['test_pct_count'] else None
 
         student_stats = {
             'enrolled_courses': len(courses),
@@ -1061,30 +2675,217 @@ def dashboard():
         calendar_items, calendar_by_date, cal_year, cal_month, cal_days, cal_first_weekday, cal_days_list = _dashboard_calendar_items(
             db, session['user_id'], session['role'], semester_filter)
         cal_month_name = _CAL_MONTHS_EL[cal_month] if 1 <= cal_month <= 12 else ''
-        db.close()
-        _ctx = dict(courses=courses, announcements=recent_announcements, upcoming_events=upcoming_events,
+        return dict(courses=courses, announcements=recent_announcements, upcoming_events=upcoming_events,
                     pending_assignments=pending_assignments, student_stats=student_stats,
                     calendar_items=calendar_items, calendar_by_date=calendar_by_date,
                     cal_year=cal_year, cal_month=cal_month, cal_month_name=cal_month_name,
                     cal_days=cal_days, cal_first_weekday=cal_first_weekday, cal_days_list=cal_days_list)
-        if _is_partial_request():
-            return render_template('dashboard_content.html', **_ctx)
-        return render_template('dashboard.html', **_ctx)
+
+
+# --- Αποθήκη αρχείων κατά περιεχόμενο ---
+# Κάθε αρχείο αποθηκεύεται μία φορά ως blob με όνομα το SHA-256 του (uploads/blobs/ab/cd/<sha256>).
+# Οι στήλες file_path κρατούν το λογικό όνομα· ο πίνακας files το αντιστοιχίζει στο blob και
+# ο blobs.refcount μετρά πόσα λογικά ονόματα δείχνουν σε κάθε blob (flask --app app gc-blobs).
+
+_BLOB_BLOCK = 64 * 1024
+
+
+def _blob_folder():
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'blobs')
+
+
+def blob_path(sha256):
+    return os.path.join(_blob_folder(), sha256[:2], sha256[2:4], sha256)
+
+
+# Blobs χωρίς αναφορές σβήνονται μόνο αν δεν χρησιμοποιήθηκαν πρόσφατα: ένα upload (ή μια υποβολή στην
+# ουρά) κρατά το blob από το ingest μέχρι το link_file.
+BLOB_GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS', 24 * 3600))
+
+
+def _pin_blob(sha256, size):
+    """Γραμμή του blob (νέα, ή ανανέωση του created_at) σε δική της συναλλαγή, πριν από τη χρήση του αρχείου.
+
+    Το gc_blobs ελέγχει και σβήνει μέσα σε BEGIN IMMEDIATE, οπότε είτε βλέπει την ανανέωση και κρατά
+    το blob, είτε τελειώνει πρώτο και το _commit_blob γράφει ξανά το αρχείο.
+    """
+    db = _db_pool.acquire()
+    try:
+        db.execute('''INSERT INTO blobs (sha256, size) VALUES (?, ?)
+                      ON CONFLICT(sha256) DO UPDATE SET created_at = CURRENT_TIMESTAMP''', (sha256, size))
+        db.commit()
+    finally:
+        _db_pool.release(db)
+
+
+def _commit_blob(tmp_path, sha256, size):
+    """Μετακίνηση προσωρινού αρχείου στη θέση του blob, ή διαγραφή του αν το περιεχόμενο υπάρχει ήδη."""
+    _pin_blob(sha256, size)
+    target = blob_path(sha256)
+    if os.path.exists(target):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+
+
+def ingest_stream(stream):
+    """Αποθήκευση ροής ως blob, με υπολογισμό του SHA-256 κατά την εγγραφή. Επιστρέφει (sha256, size)."""
+    tmp_dir = os.path.join(_blob_folder(), '.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, secrets.token_hex(16))
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, 'wb') as f:
+        while True:
+            block = stream.read(_BLOB_BLOCK)
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            size += len(block)
+    sha256 = digest.hexdigest()
+    _commit_blob(tmp_path, sha256, size)
+    metrics.inc('lms_upload_bytes_total', size, endpoint=_metrics_endpoint())
+    return sha256, size
+
+
+def ingest_file(path):
+    """Αποθήκευση ήδη γραμμένου αρχείου (π.χ. τμηματικό upload) ως blob· το αρχείο μετακινείται."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOB_BLOCK), b''):
+            digest.update(block)
+    size = os.path.getsize(path)
+    sha256 = digest.hexdigest()
+    _commit_blob(path, sha256, size)
+    return sha256, size
+
+
+def link_file(db, name, sha256, size):
+    """Αντιστοίχιση λογικού ονόματος σε blob (χωρίς commit)."""
+    db.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', (sha256, size))
+    db.execute('DELETE FROM files WHERE name = ?', (name,))
+    db.execute('INSERT INTO files (name, sha256) VALUES (?, ?)', (name, sha256))
+
+
+def resolve_file(db, name):
+    """SHA-256 του blob με αυτό το λογικό όνομα, ή None για αρχεία εκτός αποθήκης (παλιά uploads)."""
+    row = db.execute('SELECT sha256 FROM files WHERE name = ?', (name,)).fetchone()
+    return row['sha256'] if row else None
+
+
+def gc_blobs(db, grace_seconds=BLOB_GC_GRACE_SECONDS):
+    """Διαγραφή blobs χωρίς αναφορές που δεν χρησιμοποιήθηκαν τα τελευταία grace_seconds.
+
+    Επιστρέφει (πλήθος, bytes που ελευθερώθηκαν).
+    """
+    db.execute('BEGIN IMMEDIATE')  # κανένα _pin_blob ανάμεσα στον έλεγχο και τη διαγραφή των αρχείων
+    try:
+        rows = db.execute(
+            "SELECT sha256, size FROM blobs WHERE refcount <= 0 AND created_at < datetime('now', ?)",
+            ('-{} seconds'.format(int(grace_seconds)),)
+        ).fetchall()
+        freed = 0
+        for row in rows:
+            try:
+                os.remove(blob_path(row['sha256']))
+                freed += row['size']
+            except OSError:
+                pass
+        db.executemany('DELETE FROM blobs WHERE sha256 = ?', [(row['sha256'],) for row in rows])
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return len(rows), freed
+
+
+@app.cli.command('gc-blobs')
+def gc_blobs_command():
+    """Διαγράφει τα αρχεία που δεν χρησιμοποιούνται πλέον από κανένα υλικό ή υποβολή."""
+    count, freed = gc_blobs(get_db())
+    print('gc-blobs: {} blobs, {:.1f} MB'.format(count, freed / (1024 * 1024)))
+
+
+# --- Σελιδοποίηση (keyset σε created_at, id) ---
+# Οι λίστες μαθήματος/νήματος φορτώνονται ανά σελίδα: το cursor κωδικοποιεί το (created_at, id) της
+# τελευταίας γραμμής και η επόμενη σελίδα ξεκινά αμέσως μετά από αυτό, πάνω στα ευρετήρια
+# (course_id, created_at) / (discussion_id, created_at), ανεξάρτητα από το βάθος της σελίδας.
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 20))
+PAGE_SIZE_MAX = 100
+
+
+def encode_cursor(row):
+    """Αδιαφανές cursor (urlsafe base64) από το (created_at, id) μιας γραμμής."""
+    raw = '{}|{}'.format(row['created_at'], row['id']).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(created_at, id) από cursor του encode_cursor· None αν είναι άκυρο."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return created_at, int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(db, sql, params, alias, ascending=False):
+    """Μία σελίδα του sql (SELECT ... WHERE ...) ταξινομημένη κατά ({alias}.created_at, {alias}.id).
+
+    Διαβάζει τα cursor και limit από το request· επιστρέφει (rows, next_cursor), με next_cursor None
+    στην τελευταία σελίδα. Άκυρο cursor -> 400.
+    """
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), PAGE_SIZE_MAX)
+    direction, op = ('ASC', '>') if ascending else ('DESC', '<')
+    token = request.args.get('cursor')
+    if token:
+        key = decode_cursor(token)
+        if key is None:
+            abort(400)
+        sql += ' AND ({0}.created_at, {0}.id) {1} (?, ?)'.format(alias, op)
+        params = tuple(params) + key
+    rows = db.execute(
+        sql + ' ORDER BY {0}.created_at {1}, {0}.id {1} LIMIT ?'.format(alias, direction),
+        tuple(params) + (limit + 1,)
+    ).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def render_page(template, items_template, next_cursor, **context):
+    """Σελίδα λίστας ή, με ?format=json, μόνο τα επόμενα στοιχεία για infinite scroll.
+
+    Το JSON είναι {"html": <στοιχεία σελίδας>, "next": <url επόμενης σελίδας ή null>}· το
+    static/js/main.js το προσθέτει στο [data-page-items] όταν ο χρήστης φτάσει στο τέλος.
+    """
+    next_url = None
+    if next_cursor:
+        args = dict(request.view_args, cursor=next_cursor)
+        if 'limit' in request.args:
+            args['limit'] = request.args['limit']
+        next_url = url_for(request.endpoint, **args)
+    if request.args.get('format') == 'json':
+        return jsonify({'html': render_template(items_template, **context), 'next': next_url})
+    return render_template(template, next_url=next_url, paged=bool(request.args.get('cursor')), **context)
 
 
 # --- Εκπαιδευτικο υλικο ---
 
 @app.route('/course/<int:course_id>/materials')
 @login_required
+@conditional_course_response
 def materials(course_id):
     """Προβολή εκπαιδευτικού υλικού"""
     db = get_db()
     course = db.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-    materials_list = db.execute(
-        'SELECT * FROM materials WHERE course_id = ? ORDER BY created_at DESC', (course_id,)
-    ).fetchall()
-    db.close()
-    return render_template('materials.html', course=course, materials=materials_list)
+    materials_list, next_cursor = keyset_page(
+        db, 'SELECT m.* FROM materials m WHERE m.course_id = ?', (course_id,), 'm')
+    return render_page('materials.html', 'materials_page.html', next_cursor,
+                       course=course, materials=materials_list)
 
 
 @app.route('/course/<int:course_id>/materials/upload', methods=['GET', 'POST'])
@@ -1108,44 +2909,312 @@ def upload_material(course_id):
                 # Προσθήκη timestamp για αποφυγή συγκρούσεων
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
                 filename = timestamp + filename
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                link_file(db, filename, *ingest_stream(file.stream))
                 file_path = filename
 
         db.execute('''INSERT INTO materials (course_id, title, description, file_path, material_type, url)
                       VALUES (?, ?, ?, ?, ?, ?)''',
                    (course_id, title, description, file_path, material_type, url or None))
         db.commit()
-        db.close()
         flash('Το υλικό αναρτήθηκε επιτυχώς!', 'success')
         return redirect(url_for('materials', course_id=course_id))
 
-    db.close()
     return render_template('upload_material.html', course=course)
 
 
+# Παράδοση αρχείων: με DOWNLOAD_OFFLOAD=nginx το Flask ελέγχει μόνο την πρόσβαση και ο nginx στέλνει
+# το αρχείο (X-Accel-Redirect στο internal location DOWNLOAD_ACCEL_PREFIX -> UPLOAD_FOLDER)·
+# με DOWNLOAD_OFFLOAD=sendfile το ίδιο γίνεται με X-Sendfile (Apache mod_xsendfile, lighttpd).
+DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD', '').lower()
+DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-uploads/')
+app.config['USE_X_SENDFILE'] = DOWNLOAD_OFFLOAD == 'sendfile'
+BLOB_MAX_AGE = 365 * 24 * 3600
+
+
+def can_download(db, filename):
+    """Πρόσβαση σε αρχείο: υλικό για τον εκπαιδευτή και τους εγγεγραμμένους του μαθήματος,
+    υποβολή για τον φοιτητή που την έκανε και τον εκπαιδευτή του μαθήματος."""
+    user_id = session['user_id']
+    material = db.execute(
+        '''SELECT c.id, c.instructor_id FROM materials m JOIN courses c ON m.course_id = c.id
+           WHERE m.file_path = ? LIMIT 1''', (filename,)
+    ).fetchone()
+    if material:
+        if material['instructor_id'] == user_id:
+            return True
+        return db.execute('SELECT 1 FROM enrollments WHERE course_id = ? AND student_id = ?',
+                          (material['id'], user_id)).fetchone() is not None
+    submission = db.execute(
+        '''SELECT s.student_id, c.instructor_id FROM assignment_submissions s
+           JOIN assignments a ON s.assignment_id = a.id
+           JOIN courses c ON a.course_id = c.id
+           WHERE s.file_path = ? LIMIT 1''', (filename,)
+    ).fetchone()
+    return submission is not None and user_id in (submission['student_id'], submission['instructor_id'])
+
+
 @app.route('/download/<filename>')
 @login_required
 def download_file(filename):
-    """Λήψη αρχείου"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Λήψη αρχείου (μόνο με δικαίωμα πρόσβασης), με υποστήριξη Range/206 για seeking σε βίντεο.
+
+    Τα blobs είναι αμετάβλητα: ETag το SHA-256 τους και cache ενός έτους στον browser.
+    """
+    db = get_db()
+    if not can_download(db, filename):
+        abort(404)
+    sha256 = resolve_file(db, filename)
+    if sha256 is None:
+        # Παλιά uploads, πριν από την αποθήκη blobs
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, conditional=True)
+
+    if DOWNLOAD_OFFLOAD == 'nginx':
+        import mimetypes
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + os.path.relpath(
+            blob_path(sha256), app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+        response.headers['Content-Disposition'] = 'inline; filename="{}"'.format(filename)
+        response.set_etag(sha256)
+    else:
+        response = send_file(blob_path(sha256), download_name=filename, etag=sha256,
+                             conditional=True, max_age=BLOB_MAX_AGE)
+    # Ιδιωτική cache (το αρχείο απαιτεί σύνδεση), αμετάβλητη για όσο ζει
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = BLOB_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+# Τμηματικά uploads (μεγάλα αρχεία, π.χ. βίντεο διαλέξεων)
+# Ο client ξεκινά ένα upload (POST /uploads), στέλνει τμήματα με PUT /uploads/<id>?offset=N
+# (προαιρετικά με X-Chunk-SHA256) και το ολοκληρώνει (POST /uploads/<id>/complete). Τα τμήματα
+# γράφονται απευθείας στο αρχείο, οπότε η μνήμη είναι σταθερή· η γραμμή στα materials /
+# assignment_submissions δημιουργείται μόνο στην ολοκλήρωση. Μετά από διακοπή ο client
+# ρωτά GET /uploads/<id> και συνεχίζει από το received.
+
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))
+UPLOAD_EXPIRY_SECONDS = 24 * 3600
+# Όριο μεγέθους ανά τύπο υλικού (και για υποβολές)· οι υπόλοιποι τύποι κρατούν το MAX_CONTENT_LENGTH
+UPLOAD_MAX_BYTES = {
+    'video': int(os.environ.get('UPLOAD_MAX_VIDEO_MB', 2048)) * 1024 * 1024,
+    'presentation': int(os.environ.get('UPLOAD_MAX_PRESENTATION_MB', 100)) * 1024 * 1024,
+    'submission': int(os.environ.get('UPLOAD_MAX_SUBMISSION_MB', 100)) * 1024 * 1024,
+}
+# Το όριο μεγέθους υλικού προκύπτει από την επέκταση, όχι από τον τύπο που επιλέγει ο client
+UPLOAD_EXTENSION_TYPES = {'mp4': 'video', 'ppt': 'presentation', 'pptx': 'presentation'}
+MATERIAL_TYPES = ('document', 'presentation', 'video', 'image', 'other')  # οι επιλογές του upload_material.html
+_UPLOAD_BLOCK = 64 * 1024
+
+
+def _upload_size_limit(filename):
+    """Όριο μεγέθους υλικού με βάση την επέκταση (MAX_CONTENT_LENGTH για όσες δεν έχουν δικό τους όριο)."""
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    return UPLOAD_MAX_BYTES.get(UPLOAD_EXTENSION_TYPES.get(ext), app.config['MAX_CONTENT_LENGTH'])
+
+
+def _partial_path(upload_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], '.partial', upload_id)
+
+
+def _expire_stale_uploads(db):
+    """Διαγραφή uploads που εγκαταλείφθηκαν (και των μισών αρχείων τους)."""
+    cutoff = time.time() - UPLOAD_EXPIRY_SECONDS
+    stale = db.execute('SELECT id FROM uploads WHERE created_at < ?', (cutoff,)).fetchall()
+    for row in stale:
+        try:
+            os.remove(_partial_path(row['id']))
+        except OSError:
+            pass
+    if stale:
+        db.execute('DELETE FROM uploads WHERE created_at < ?', (cutoff,))
+
+
+def _user_upload(db, upload_id):
+    return db.execute('SELECT * FROM uploads WHERE id = ? AND user_id = ?',
+                      (upload_id, session['user_id'])).fetchone()
+
+
+@app.route('/uploads', methods=['POST'])
+@login_required
+def start_upload():
+    """Έναρξη τμηματικού upload υλικού (εκπαιδευτής) ή υποβολής εργασίας (φοιτητής)."""
+    kind = request.form.get('kind')
+    target_id = request.form.get('target_id', type=int)
+    filename = request.form.get('filename', '')
+    size = request.form.get('size', type=int)
+    db = get_db()
+
+    if kind == 'material':
+        if session['role'] != 'instructor':
+            return jsonify({'error': 'Forbidden'}), 403
+        if not db.execute('SELECT 1 FROM courses WHERE id = ?', (target_id,)).fetchone():
+            return jsonify({'error': 'Not found'}), 404
+        material_type = request.form.get('material_type', 'document')
+        if material_type not in MATERIAL_TYPES:
+            return jsonify({'error': 'Invalid material type'}), 400
+        limit = _upload_size_limit(filename)
+        metadata = {'title': request.form.get('title', '').strip(),
+                    'description': request.form.get('description', '').strip(),
+                    'material_type': material_type,
+                    'url': request.form.get('url', '').strip()}
+    elif kind == 'submission':
+        if session['role'] != 'student':
+            return jsonify({'error': 'Forbidden'}), 403
+        if not db.execute('SELECT 1 FROM assignments WHERE id = ?', (target_id,)).fetchone():
+            return jsonify({'error': 'Not found'}), 404
+        if db.execute('SELECT 1 FROM assignment_submissions WHERE assignment_id = ? AND student_id = ?',
+                      (target_id, session['user_id'])).fetchone():
+            return jsonify({'error': 'Έχετε ήδη υποβάλει αυτή την εργασία.'}), 409
+        limit = UPLOAD_MAX_BYTES['submission']
+        metadata = {'comment': request.form.get('comment', '').strip()}
+    else:
+        return jsonify({'error': 'Invalid upload kind'}), 400
+
+    if not filename or not allowed_file(filename) or not secure_filename(filename):
+        return jsonify({'error': 'Μη επιτρεπτός τύπος αρχείου.'}), 400
+    if not size or size <= 0:
+        return jsonify({'error': 'Invalid size'}), 400
+    if size > limit:
+        return jsonify({'error': 'Το αρχείο ξεπερνά το όριο των {} MB.'.format(limit // (1024 * 1024))}), 413
+
+    _expire_stale_uploads(db)
+    upload_id = secrets.token_hex(16)
+    os.makedirs(os.path.dirname(_partial_path(upload_id)), exist_ok=True)
+    open(_partial_path(upload_id), 'wb').close()
+    db.execute('''INSERT INTO uploads (id, user_id, kind, target_id, filename, size, metadata, created_at)
+                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+               (upload_id, session['user_id'], kind, target_id, filename, size,
+                json.dumps(metadata, ensure_ascii=False), time.time()))
+    db.commit()
+    return jsonify({'upload_id': upload_id, 'chunk_size': UPLOAD_CHUNK_SIZE, 'received': 0, 'size': size}), 201
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    """Πρόοδος upload (για συνέχιση μετά από διακοπή)."""
+    upload = _user_upload(get_db(), upload_id)
+    if not upload:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'upload_id': upload_id, 'chunk_size': UPLOAD_CHUNK_SIZE,
+                    'received': upload['received'], 'size': upload['size']})
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    """Λήψη ενός τμήματος στη θέση offset, γραμμένου απευθείας στο αρχείο σε μικρά blocks."""
+    db = get_db()
+    upload = _user_upload(db, upload_id)
+    if not upload:
+        return jsonify({'error': 'Not found'}), 404
+    offset = request.args.get('offset', type=int)
+    length = request.content_length or 0
+    if offset != upload['received']:
+        # Ο client συνεχίζει από εκεί που πραγματικά έχει φτάσει το αρχείο
+        return jsonify({'error': 'Offset mismatch', 'received': upload['received']}), 409
+    if length <= 0 or length > UPLOAD_CHUNK_SIZE or offset + length > upload['size']:
+        return jsonify({'error': 'Invalid chunk length'}), 400
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(_partial_path(upload_id), 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            block = request.stream.read(min(_UPLOAD_BLOCK, length - written))
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            written += len(block)
+        expected = request.headers.get('X-Chunk-SHA256')
+        if written != length or (expected and expected.lower() != digest.hexdigest()):
+            f.truncate(offset)
+            return jsonify({'error': 'Chunk checksum mismatch', 'received': offset}), 400
+    metrics.inc('lms_upload_bytes_total', written, endpoint=request.endpoint)
+    db.execute('UPDATE uploads SET received = ? WHERE id = ?', (offset + written, upload_id))
+    db.commit()
+    return jsonify({'received': offset + written, 'size': upload['size']})
+
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """Ολοκλήρωση: μετακίνηση του αρχείου στον φάκελο uploads και δημιουργία της εγγραφής υλικού/υποβολής."""
+    db = get_db()
+    upload = _user_upload(db, upload_id)
+    if not upload:
+        return jsonify({'error': 'Not found'}), 404
+    if upload['received'] != upload['size']:
+        return jsonify({'error': 'Upload incomplete', 'received': upload['received']}), 409
+
+    if upload['kind'] == 'submission' and db.execute(
+            'SELECT 1 FROM assignment_submissions WHERE assignment_id = ? AND student_id = ?',
+            (upload['target_id'], session['user_id'])).fetchone():
+        # Υποβολή από άλλο κανάλι όσο ανέβαινε το αρχείο: το upload απορρίπτεται όπως στο submit_assignment
+        try:
+            os.remove(_partial_path(upload_id))
+        except OSError:
+            pass
+        db.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+        db.commit()
+        return jsonify({'error': 'Έχετε ήδη υποβάλει αυτή την εργασία.'}), 409
+
+    metadata = json.loads(upload['metadata'] or '{}')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+    if upload['kind'] == 'material':
+        filename = timestamp + secure_filename(upload['filename'])
+    else:
+        filename = f"sub_{session['user_id']}_{timestamp}{secure_filename(upload['filename'])}"
+    blob = ingest_file(_partial_path(upload_id))
+    db.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+
+    if upload['kind'] == 'material':
+        link_file(db, filename, *blob)
+        db.execute('''INSERT INTO materials (course_id, title, description, file_path, material_type, url)
+                      VALUES (?, ?, ?, ?, ?, ?)''',
+                   (upload['target_id'], metadata.get('title', ''), metadata.get('description', ''), filename,
+                    metadata.get('material_type', 'document'), metadata.get('url') or None))
+        db.commit()
+        flash('Το υλικό αναρτήθηκε επιτυχώς!', 'success')
+        return jsonify({'redirect': url_for('materials', course_id=upload['target_id'])})
+
+    assignment = db.execute('SELECT course_id FROM assignments WHERE id = ?', (upload['target_id'],)).fetchone()
+    if submission_queue is not None:
+        db.commit()
+        ticket, created = submission_queue.enqueue('assignment', session['user_id'], {
+            'assignment_id': upload['target_id'], 'course_id': assignment['course_id'],
+            'file_path': filename, 'blob': blob, 'comment': metadata.get('comment', ''),
+            'submitted_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())})
+        if not created:
+            # Όπως στο submit_assignment: μήνυμα και μετάβαση στην υποβολή που ήδη περιμένει
+            flash('Η υποβολή σας για αυτή την εργασία βρίσκεται ήδη σε επεξεργασία.', 'warning')
+            return jsonify({'error': 'Already pending', 'redirect': url_for('queued_submission', ticket=ticket)}), 409
+        flash('Η εργασία υποβλήθηκε επιτυχώς!', 'success')
+        return jsonify({'redirect': url_for('queued_submission', ticket=ticket)})
+    flash('Η εργασία υποβλήθηκε επιτυχώς!', 'success')
+    save_assignment_submission(db, upload['target_id'], session['user_id'], filename, metadata.get('comment', ''),
+                               blob=blob)
+    db.commit()
+    return jsonify({'redirect': url_for('assignments', course_id=assignment['course_id'])})
 
 
 # Ανακοινωσεις
 
 @app.route('/course/<int:course_id>/announcements')
 @login_required
+@conditional_course_response
 def announcements(course_id):
     """Προβολή ανακοινώσεων"""
     db = get_db()
     course = db.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-    announcements_list = db.execute(
-        '''SELECT a.*, u.full_name as author_name FROM announcements a
-           JOIN users u ON a.author_id = u.id
-           WHERE a.course_id = ?
-           ORDER BY a.created_at DESC''', (course_id,)
-    ).fetchall()
-    db.close()
-    return render_template('announcements.html', course=course, announcements=announcements_list)
+    announcements_list, next_cursor = keyset_page(
+        db, '''SELECT a.*, u.full_name as author_name FROM announcements a
+               JOIN users u ON a.author_id = u.id
+               WHERE a.course_id = ?''', (course_id,), 'a')
+    return render_page('announcements.html', 'announcements_page.html', next_cursor,
+                       course=course, announcements=announcements_list)
 
 
 @app.route('/course/<int:course_id>/announcements/create', methods=['GET', 'POST'])
@@ -1165,12 +3234,10 @@ def create_announcement(course_id):
                        (course_id, title, content, session['user_id']))
             db.commit()
             flash('Η ανακοίνωση δημοσιεύτηκε!', 'success')
-            db.close()
             return redirect(url_for('announcements', course_id=course_id))
         else:
             flash('Παρακαλώ συμπληρώστε τίτλο και περιεχόμενο.', 'danger')
 
-    db.close()
     return render_template('create_announcement.html', course=course)
 
 
@@ -1210,7 +3277,6 @@ def assignments(course_id):
             ).fetchall()
             all_submissions[a['id']] = subs
 
-    db.close()
     return render_template('assignments.html', course=course,
                            assignments=assignments_list, submissions=submissions,
                            all_submissions=all_submissions)
@@ -1235,13 +3301,32 @@ def create_assignment(course_id):
                        (course_id, title, description, due_date or None, max_grade))
             db.commit()
             flash('Η εργασία δημιουργήθηκε!', 'success')
-            db.close()
             return redirect(url_for('assignments', course_id=course_id))
 
-    db.close()
     return render_template('create_assignment.html', course=course)
 
 
+def _now_str():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def save_assignment_submission(db, assignment_id, student_id, file_path, comment, submitted_at=None, blob=None):
+    """Εγγραφή υποβολής εργασίας (χωρίς commit). Επιστρέφει το id της, ή της υπάρχουσας αν ήδη υποβλήθηκε.
+
+    Το blob (sha256, size) του αρχείου συνδέεται με το file_path μόνο αν γράφτηκε νέα υποβολή, ώστε μια
+    διπλή υποβολή να μην αφήνει αναφορά στο blob χωρίς κάτοχο.
+    """
+    cur = db.execute('''INSERT OR IGNORE INTO assignment_submissions (assignment_id, student_id, file_path, comment, submitted_at)
+                        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))''',
+                     (assignment_id, student_id, file_path, comment, submitted_at))
+    if cur.rowcount and blob:
+        link_file(db, file_path, *blob)
+    return db.execute(
+        'SELECT id FROM assignment_submissions WHERE assignment_id = ? AND student_id = ?',
+        (assignment_id, student_id)
+    ).fetchone()['id']
+
+
 @app.route('/assignment/<int:assignment_id>/submit', methods=['GET', 'POST'])
 @login_required
 def submit_assignment(assignment_id):
@@ -1255,7 +3340,6 @@ def submit_assignment(assignment_id):
 
     if not assignment:
         flash('Η εργασία δεν βρέθηκε.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     # Έλεγχος αν υπάρχει ήδη υποβολή
@@ -1266,12 +3350,12 @@ def submit_assignment(assignment_id):
 
     if existing:
         flash('Έχετε ήδη υποβάλει αυτή την εργασία.', 'warning')
-        db.close()
         return redirect(url_for('assignments', course_id=assignment['course_id']))
 
     if request.method == 'POST':
         comment = request.form.get('comment', '').strip()
         file_path = None
+        blob = None
 
         if 'file' in request.files:
             file = request.files['file']
@@ -1279,18 +3363,25 @@ def submit_assignment(assignment_id):
                 filename = secure_filename(file.filename)
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
                 filename = f"sub_{session['user_id']}_{timestamp}{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                blob = ingest_stream(file.stream)
                 file_path = filename
 
-        db.execute('''INSERT INTO assignment_submissions (assignment_id, student_id, file_path, comment)
-                      VALUES (?, ?, ?, ?)''',
-                   (assignment_id, session['user_id'], file_path, comment))
+        if submission_queue is not None:
+            ticket, created = submission_queue.enqueue('assignment', session['user_id'], {
+                'assignment_id': assignment_id, 'course_id': assignment['course_id'],
+                'file_path': file_path, 'blob': blob, 'comment': comment,
+                'submitted_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())})
+            if created:
+                flash('Η εργασία υποβλήθηκε επιτυχώς!', 'success')
+            else:
+                flash('Η υποβολή σας για αυτή την εργασία βρίσκεται ήδη σε επεξεργασία.', 'warning')
+            return redirect(url_for('queued_submission', ticket=ticket))
+
+        save_assignment_submission(db, assignment_id, session['user_id'], file_path, comment, blob=blob)
         db.commit()
         flash('Η εργασία υποβλήθηκε επιτυχώς!', 'success')
-        db.close()
         return redirect(url_for('assignments', course_id=assignment['course_id']))
 
-    db.close()
     return render_template('submit_assignment.html', assignment=assignment)
 
 
@@ -1310,7 +3401,6 @@ def grade_submission(submission_id):
 
     if not submission:
         flash('Η υποβολή δεν βρέθηκε.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     if request.method == 'POST':
@@ -1323,10 +3413,8 @@ def grade_submission(submission_id):
                    (grade, feedback, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), submission_id))
         db.commit()
         flash('Η βαθμολογία καταχωρήθηκε!', 'success')
-        db.close()
         return redirect(url_for('assignments', course_id=submission['course_id']))
 
-    db.close()
     return render_template('grade_submission.html', submission=submission)
 
 
@@ -1375,7 +3463,6 @@ def tests(course_id):
                 'questions': question_count
             }
 
-    db.close()
     return render_template('tests.html', course=course, tests=tests_list,
                            attempts=attempts, test_stats=test_stats)
 
@@ -1431,14 +3518,71 @@ def create_test(course_id):
                 q_index += 1
 
             db.commit()
+            invalidate_answer_key(test_id)
             flash('Το τεστ δημιουργήθηκε επιτυχώς!', 'success')
-            db.close()
             return redirect(url_for('tests', course_id=course_id))
 
-    db.close()
     return render_template('create_test.html', course=course)
 
 
+ANSWER_KEY_TTL = int(os.environ.get('ANSWER_KEY_TTL', 3600))
+
+
+def test_answer_key(db, test_id):
+    """Κλειδί απαντήσεων τεστ: [question_id, κανονικοποιημένη σωστή απάντηση, βαθμοί] ανά ερώτηση, από cache."""
+    key = 'answer_key:{}'.format(test_id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        rows = db.execute(
+            'SELECT id, correct_answer, points FROM test_questions WHERE test_id = ? ORDER BY id', (test_id,)
+        ).fetchall()
+        answer_key = [[r['id'], r['correct_answer'].strip().lower(), r['points']] for r in rows]
+        cache.set(key, answer_key, ANSWER_KEY_TTL)
+    return answer_key
+
+
+def invalidate_answer_key(test_id):
+    """Ακύρωση του cached κλειδιού απαντήσεων όταν αλλάζουν οι ερωτήσεις ενός τεστ."""
+    cache.delete('answer_key:{}'.format(test_id))
+
+
+def grade_test_answers(answer_key, form):
+    """Βαθμολόγηση υποβολής σε ένα πέρασμα. Επιστρέφει ([(question_id, απάντηση, is_correct)], score, max_score)."""
+    answers = []
+    total_score = 0
+    max_score = 0
+    for question_id, correct, points in answer_key:
+        student_answer = form.get(f'answer_{question_id}', '').strip()
+        is_correct = 1 if student_answer.lower() == correct else 0
+        if is_correct:
+            total_score += points
+        max_score += points
+        answers.append((question_id, student_answer, is_correct))
+    return answers, total_score, max_score
+
+
+def save_test_attempt(db, test_id, student_id, answers, score, max_score, completed_at):
+    """Εγγραφή ολοκληρωμένης απόπειρας και των απαντήσεών της (χωρίς commit). Επιστρέφει το id της απόπειρας.
+
+    Αν ο φοιτητής έχει ήδη ολοκληρωμένη απόπειρα (π.χ. διπλή υποβολή από την ουρά), επιστρέφει εκείνη.
+    """
+    existing = db.execute(
+        'SELECT id FROM test_attempts WHERE test_id = ? AND student_id = ? AND completed_at IS NOT NULL',
+        (test_id, student_id)
+    ).fetchone()
+    if existing:
+        return existing['id']
+    cursor = db.execute(
+        '''INSERT INTO test_attempts (test_id, student_id, score, max_score, completed_at)
+           VALUES (?, ?, ?, ?, ?)''',
+        (test_id, student_id, score, max_score, completed_at))
+    attempt_id = cursor.lastrowid
+    db.executemany('''INSERT INTO test_answers (attempt_id, question_id, student_answer, is_correct)
+                      VALUES (?, ?, ?, ?)''',
+                   [(attempt_id, *answer) for answer in answers])
+    return attempt_id
+
+
 @app.route('/test/<int:test_id>/take', methods=['GET', 'POST'])
 @login_required
 def take_test(test_id):
@@ -1456,7 +3600,6 @@ def take_test(test_id):
 
     if not test:
         flash('Το τεστ δεν βρέθηκε.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     # Έλεγχος αν έχει ήδη δώσει
@@ -1467,49 +3610,30 @@ def take_test(test_id):
 
     if existing_attempt:
         flash('Έχετε ήδη ολοκληρώσει αυτό το τεστ.', 'warning')
-        db.close()
         return redirect(url_for('test_result', attempt_id=existing_attempt['id']))
 
-    questions = db.execute(
-        'SELECT * FROM test_questions WHERE test_id = ? ORDER BY id', (test_id,)
-    ).fetchall()
-
     if request.method == 'POST':
-        # Δημιουργία attempt
-        cursor = db.execute(
-            'INSERT INTO test_attempts (test_id, student_id, max_score) VALUES (?, ?, ?)',
-            (test_id, session['user_id'],
-             sum(q['points'] for q in questions)))
-        attempt_id = cursor.lastrowid
-
-        total_score = 0
-        max_score = 0
-
-        for q in questions:
-            student_answer = request.form.get(f'answer_{q["id"]}', '').strip()
-            correct = q['correct_answer'].strip().lower()
-            given = student_answer.strip().lower()
-            is_correct = 1 if given == correct else 0
-
-            if is_correct:
-                total_score += q['points']
-            max_score += q['points']
-
-            db.execute('''INSERT INTO test_answers (attempt_id, question_id, student_answer, is_correct)
-                          VALUES (?, ?, ?, ?)''',
-                       (attempt_id, q['id'], student_answer, is_correct))
-
-        # Ενημέρωση βαθμολογίας
-        db.execute('''UPDATE test_attempts
-                      SET score = ?, max_score = ?, completed_at = ?
-                      WHERE id = ?''',
-                   (total_score, max_score, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), attempt_id))
+        # Βαθμολόγηση με το (cached) κλειδί απαντήσεων και εγγραφή όλων των απαντήσεων σε μία συναλλαγή
+        answers, total_score, max_score = grade_test_answers(test_answer_key(db, test_id), request.form)
+        if submission_queue is not None:
+            ticket, created = submission_queue.enqueue('test', session['user_id'], {
+                'test_id': test_id, 'answers': answers, 'score': total_score,
+                'max_score': max_score, 'completed_at': _now_str()})
+            if created:
+                flash(f'Ολοκληρώσατε το τεστ! Βαθμός: {total_score}/{max_score}', 'success')
+            else:
+                flash('Η υποβολή σας για αυτό το τεστ βρίσκεται ήδη σε επεξεργασία.', 'warning')
+            return redirect(url_for('queued_submission', ticket=ticket))
 
-        db.commit()
         flash(f'Ολοκληρώσατε το τεστ! Βαθμός: {total_score}/{max_score}', 'success')
-        db.close()
+        attempt_id = save_test_attempt(db, test_id, session['user_id'], answers, total_score, max_score, _now_str())
+        db.commit()
         return redirect(url_for('test_result', attempt_id=attempt_id))
 
+    questions = db.execute(
+        'SELECT * FROM test_questions WHERE test_id = ? ORDER BY id', (test_id,)
+    ).fetchall()
+
     # Μετατροπή options σε λίστα
     questions_parsed = []
     for q in questions:
@@ -1520,7 +3644,6 @@ def take_test(test_id):
             q_dict['options_list'] = []
         questions_parsed.append(q_dict)
 
-    db.close()
     return render_template('take_test.html', test=test, questions=questions_parsed)
 
 
@@ -1539,13 +3662,11 @@ def test_result(attempt_id):
 
     if not attempt:
         flash('Τα αποτελέσματα δεν βρέθηκαν.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     # Μόνο ο ίδιος ο φοιτητής ή ο εκπαιδευτής μπορεί να δει
     if session['role'] == 'student' and attempt['student_id'] != session['user_id']:
         flash('Δεν έχετε πρόσβαση σε αυτά τα αποτελέσματα.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     answers = db.execute(
@@ -1565,10 +3686,211 @@ def test_result(attempt_id):
             a_dict['options_list'] = json.loads(a['options'])
         answers_parsed.append(a_dict)
 
-    db.close()
     return render_template('test_result.html', attempt=attempt, answers=answers_parsed)
 
 
+# Ουρά υποβολών (write-behind, SUBMISSION_QUEUE=1)
+# Στις προθεσμίες οι υποβολές τεστ/εργασιών γράφονται πρώτα σε journal (ξεχωριστό αρχείο SQLite,
+# ώστε να μην περιμένουν το lock της κύριας βάσης) και ένας writer τις περνά στη βάση σε παρτίδες.
+
+class SubmissionQueue:
+    """Journal υποβολών με worker thread που τις εφαρμόζει στη βάση σε μία συναλλαγή ανά παρτίδα.
+
+    Κάθε εγγραφή περνά pending -> claimed -> done/failed. Όσες έμειναν claimed από worker που
+    σταμάτησε (π.χ. restart) ξαναδιεκδικούνται μετά από LEASE_SECONDS, οπότε τίποτα δεν χάνεται·
+    οι εφαρμογές είναι idempotent (μία απόπειρα/υποβολή ανά φοιτητή).
+    """
+
+    LEASE_SECONDS = 60
+    RETENTION_SECONDS = 24 * 3600
+
+    def __init__(self, path, pool, batch_size=100):
+        self.path = path
+        self.pool = pool
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._db().execute('''CREATE TABLE IF NOT EXISTS submission_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            claimed_at REAL,
+            result_id INTEGER,
+            error TEXT,
+            created_at REAL NOT NULL
+        )''')
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            # autocommit: κάθε εντολή είναι δική της συναλλαγή, εκτός από τα ρητά BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = FULL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def enqueue(self, kind, user_id, payload):
+        """Αποθήκευση υποβολής στο journal. Επιστρέφει (ticket, created) για έλεγχο κατάστασης.
+
+        Αν ο χρήστης έχει ήδη υποβολή σε αναμονή για το ίδιο τεστ/εργασία, δεν γράφεται δεύτερη:
+        επιστρέφεται το ticket της υπάρχουσας με created=False.
+        """
+        db = self._db()
+        path = '$.' + SUBMISSION_TARGETS[kind]
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                '''SELECT id FROM submission_queue
+                   WHERE kind = ? AND user_id = ? AND status IN ('pending', 'claimed') AND json_extract(payload, ?) = ?''',
+                (kind, user_id, path, payload[SUBMISSION_TARGETS[kind]])
+            ).fetchone()
+            if row is None:
+                ticket = db.execute(
+                    'INSERT INTO submission_queue (kind, user_id, payload, created_at) VALUES (?, ?, ?, ?)',
+                    (kind, user_id, json.dumps(payload, ensure_ascii=False), time.time())
+                ).lastrowid
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if row is not None:
+            return row['id'], False
+        self.start()
+        self._wakeup.set()
+        return ticket, True
+
+    def status(self, ticket):
+        row = self._db().execute('SELECT * FROM submission_queue WHERE id = ?', (ticket,)).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        item['payload'] = json.loads(item['payload'])
+        return item
+
+    def start(self):
+        """Εκκίνηση του worker του process (και μετά από fork) αν δεν τρέχει ήδη."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name='submission-writer', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=self.LEASE_SECONDS / 2)
+            self._wakeup.clear()
+            try:
+                while self.drain():
+                    pass
+            except Exception:
+                app.logger.exception('submission queue: αποτυχία εφαρμογής παρτίδας')
+                time.sleep(1)
+
+    def _claim(self):
+        db = self._db()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                '''SELECT * FROM submission_queue
+                   WHERE status = 'pending' OR (status = 'claimed' AND claimed_at < ?)
+                   ORDER BY id LIMIT ?''', (now - self.LEASE_SECONDS, self.batch_size)
+            ).fetchall()
+            db.executemany("UPDATE submission_queue SET status = 'claimed', claimed_at = ? WHERE id = ?",
+                           [(now, r['id']) for r in rows])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return rows
+
+    def drain(self):
+        """Εφαρμογή μίας παρτίδας σε μία συναλλαγή της βάσης. Επιστρέφει πόσες υποβολές επεξεργάστηκαν."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        results = []
+        db = self.pool.acquire()
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            for row in rows:
+                # Κάθε υποβολή σε δικό της savepoint: μια αποτυχία δεν ακυρώνει την υπόλοιπη παρτίδα
+                db.execute('SAVEPOINT submission')
+                try:
+                    result_id = SUBMISSION_APPLIERS[row['kind']](db, row['user_id'], json.loads(row['payload']))
+                    db.execute('RELEASE submission')
+                    results.append(('done', result_id, None, row['id']))
+                except Exception as exc:
+                    app.logger.exception('submission queue: αποτυχία υποβολής %s (%s)', row['id'], row['kind'])
+                    db.execute('ROLLBACK TO submission')
+                    db.execute('RELEASE submission')
+                    results.append(('failed', None, str(exc), row['id']))
+            db.commit()
+        finally:
+            self.pool.release(db)
+        queue_db = self._db()
+        queue_db.execute('BEGIN IMMEDIATE')
+        queue_db.executemany('UPDATE submission_queue SET status = ?, result_id = ?, error = ? WHERE id = ?', results)
+        queue_db.execute("DELETE FROM submission_queue WHERE status IN ('done', 'failed') AND created_at < ?",
+                         (time.time() - self.RETENTION_SECONDS,))
+        queue_db.execute('COMMIT')
+        return len(rows)
+
+    def has_pending(self):
+        return self._db().execute(
+            "SELECT 1 FROM submission_queue WHERE status IN ('pending', 'claimed') LIMIT 1"
+        ).fetchone() is not None
+
+
+def _apply_queued_test(db, student_id, payload):
+    return save_test_attempt(db, payload['test_id'], student_id, payload['answers'],
+                             payload['score'], payload['max_score'], payload['completed_at'])
+
+
+def _apply_queued_assignment(db, student_id, payload):
+    return save_assignment_submission(db, payload['assignment_id'], student_id, payload['file_path'],
+                                      payload['comment'], payload['submitted_at'], payload.get('blob'))
+
+
+SUBMISSION_APPLIERS = {'test': _apply_queued_test, 'assignment': _apply_queued_assignment}
+# Πεδίο του payload που ορίζει το τεστ/την εργασία (μία υποβολή σε αναμονή ανά χρήστη και στόχο)
+SUBMISSION_TARGETS = {'test': 'test_id', 'assignment': 'assignment_id'}
+
+submission_queue = None
+if os.environ.get('SUBMISSION_QUEUE', '0').lower() in ('1', 'true', 'yes'):
+    submission_queue = SubmissionQueue(os.environ.get('SUBMISSION_QUEUE_PATH') or DB_PATH + '.queue', _db_pool,
+                                       int(os.environ.get('SUBMISSION_QUEUE_BATCH', 100)))
+
+
+@app.route('/submission/queued/<int:ticket>')
+@login_required
+def queued_submission(ticket):
+    """Κατάσταση υποβολής στην ουρά: ανακατεύθυνση στο αποτέλεσμα μόλις καταχωρηθεί (AJAX: JSON)."""
+    item = submission_queue.status(ticket) if submission_queue is not None else None
+    if item is None or item['user_id'] != session['user_id']:
+        flash('Η υποβολή δεν βρέθηκε.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'status': item['status'], 'result_id': item['result_id']})
+    if item['status'] == 'done':
+        if item['kind'] == 'test':
+            return redirect(url_for('test_result', attempt_id=item['result_id']))
+        return redirect(url_for('assignments', course_id=item['payload']['course_id']))
+    if item['status'] == 'failed':
+        flash('Η υποβολή δεν καταχωρήθηκε. Παρακαλώ δοκιμάστε ξανά.', 'danger')
+        return redirect(url_for('dashboard'))
+    return render_template('submission_pending.html', item=item)
+
+
 # Συζητησεις (forum)
 
 @app.route('/course/<int:course_id>/discussions')
@@ -1577,17 +3899,22 @@ def discussions(course_id):
     """Προβολή συζητήσεων"""
     db = get_db()
     course = db.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-    discussions_list = db.execute(
-        '''SELECT d.*, u.full_name as author_name,
-                  (SELECT COUNT(*) FROM discussion_posts WHERE discussion_id = d.id) as post_count,
-                  (SELECT MAX(created_at) FROM discussion_posts WHERE discussion_id = d.id) as last_post
-           FROM discussions d
-           JOIN users u ON d.author_id = u.id
-           WHERE d.course_id = ?
-           ORDER BY d.created_at DESC''', (course_id,)
-    ).fetchall()
-    db.close()
-    return render_template('discussions.html', course=course, discussions=discussions_list)
+    discussions_list, next_cursor = keyset_page(
+        db, '''SELECT d.*, u.full_name as author_name,
+                      COALESCE(dc.post_count, 0) as post_count, dc.last_post
+               FROM discussions d
+               JOIN users u ON d.author_id = u.id
+               LEFT JOIN discussion_counters dc ON dc.discussion_id = d.id
+               WHERE d.course_id = ?''', (course_id,), 'd')
+    return render_page('discussions.html', 'discussions_page.html', next_cursor,
+                       course=course, discussions=discussions_list)
+
+
+def thread_post_url(discussion_id, post):
+    """URL της σελίδας του νήματος που ξεκινά από την απάντηση post (cursor αμέσως πριν από αυτήν)."""
+    start = encode_cursor({'created_at': post['created_at'], 'id': post['id'] - 1})
+    return url_for('discussion_thread', discussion_id=discussion_id, cursor=start,
+                   _anchor='post-{}'.format(post['id']))
 
 
 @app.route('/discussion/<int:discussion_id>', methods=['GET', 'POST'])
@@ -1605,31 +3932,30 @@ def discussion_thread(discussion_id):
 
     if not discussion:
         flash('Η συζήτηση δεν βρέθηκε.', 'danger')
-        db.close()
         return redirect(url_for('dashboard'))
 
     if request.method == 'POST':
         content = request.form.get('content', '').strip()
         if content:
-            db.execute('''INSERT INTO discussion_posts (discussion_id, author_id, content)
-                          VALUES (?, ?, ?)''',
-                       (discussion_id, session['user_id'], content))
+            cursor = db.execute('''INSERT INTO discussion_posts (discussion_id, author_id, content)
+                                   VALUES (?, ?, ?)''',
+                                (discussion_id, session['user_id'], content))
+            post = db.execute('SELECT id, created_at FROM discussion_posts WHERE id = ?',
+                              (cursor.lastrowid,)).fetchone()
             db.commit()
             flash('Η απάντησή σας δημοσιεύτηκε!', 'success')
-        else:
-            flash('Παρακαλώ γράψτε κάτι.', 'warning')
-
-    posts = db.execute(
-        '''SELECT p.*, u.full_name as author_name, u.role as author_role
-           FROM discussion_posts p
-           JOIN users u ON p.author_id = u.id
-           WHERE p.discussion_id = ?
-           ORDER BY p.created_at ASC''', (discussion_id,)
-    ).fetchall()
+            return redirect(thread_post_url(discussion_id, post))
+        flash('Παρακαλώ γράψτε κάτι.', 'warning')
+
+    posts, next_cursor = keyset_page(
+        db, '''SELECT p.*, u.full_name as author_name, u.role as author_role
+               FROM discussion_posts p
+               JOIN users u ON p.author_id = u.id
+               WHERE p.discussion_id = ?''', (discussion_id,), 'p', ascending=True)
 
     g.current_course_id = discussion['course_id']
-    db.close()
-    return render_template('discussion_thread.html', discussion=discussion, posts=posts)
+    return render_page('discussion_thread.html', 'discussion_posts_page.html', next_cursor,
+                       discussion=discussion, posts=posts)
 
 
 @app.route('/course/<int:course_id>/discussions/create', methods=['GET', 'POST'])
@@ -1655,17 +3981,117 @@ def create_discussion(course_id):
                        (discussion_id, session['user_id'], content))
             db.commit()
             flash('Η συζήτηση δημιουργήθηκε!', 'success')
-            db.close()
             return redirect(url_for('discussions', course_id=course_id))
 
-    db.close()
     return render_template('create_discussion.html', course=course)
 
 
+# Αναζητηση
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_EXCERPT_CHARS = 160
+
+# Ανά είδος: query που φέρνει τις αρχικές (με τόνους) γραμμές των αποτελεσμάτων μιας σελίδας
+SEARCH_ROWS_SQL = {
+    'material': '''SELECT m.id, m.course_id, m.title, m.description AS body, m.created_at
+                    FROM materials m WHERE m.id IN ({})''',
+    'announcement': '''SELECT a.id, a.course_id, a.title, a.content AS body, a.created_at
+                        FROM announcements a WHERE a.id IN ({})''',
+    'discussion': '''SELECT d.id, d.course_id, d.title, '' AS body, d.created_at
+                      FROM discussions d WHERE d.id IN ({})''',
+    'post': '''SELECT p.id, d.course_id, d.title, p.content AS body, p.created_at, p.discussion_id
+                FROM discussion_posts p JOIN discussions d ON d.id = p.discussion_id WHERE p.id IN ({})''',
+}
+
+
+def search_match_query(text):
+    """Έκφραση MATCH του FTS5: κάθε λέξη του χρήστη (χωρίς τόνους) ως πρόθεμα, όλες υποχρεωτικές."""
+    return ' '.join('"{}"*'.format(word) for word in re.findall(r'\w+', fold_text(text)))
+
+
+def search_content(db, text, course_ids, limit, offset=0):
+    """Αποτελέσματα αναζήτησης στα μαθήματα course_ids, κατά σχετικότητα (bm25, ο τίτλος μετρά περισσότερο).
+
+    Επιστρέφει λίστα dict με kind, τίτλο, μάθημα, url και απόσπασμα γύρω από την πρώτη λέξη που ταιριάζει.
+    """
+    match = search_match_query(text)
+    if not match or not course_ids:
+        return []
+    hits = db.execute(
+        '''SELECT rowid FROM search_index
+           WHERE search_index MATCH ? AND course_id IN ({})
+           ORDER BY rank LIMIT ? OFFSET ?'''.format(','.join('?' * len(course_ids))),
+        [match] + list(course_ids) + [limit, offset]
+    ).fetchall()
+    keys = [(SEARCH_SOURCES[r[0] % 4][0], r[0] // 4) for r in hits]
+    rows = {}
+    for kind, sql in SEARCH_ROWS_SQL.items():
+        ids = [item_id for k, item_id in keys if k == kind]
+        if ids:
+            rows.update(((kind, r['id']), r) for r in db.execute(sql.format(','.join('?' * len(ids))), ids))
+    words = re.findall(r'\w+', fold_text(text).lower())
+    course_names = dict(db.execute(
+        'SELECT id, name FROM courses WHERE id IN ({})'.format(','.join('?' * len(course_ids))),
+        list(course_ids)).fetchall())
+    results = []
+    for kind, item_id in keys:
+        row = rows.get((kind, item_id))
+        if row is None:
+            continue
+        if kind == 'material':
+            url = url_for('materials', course_id=row['course_id'])
+        elif kind == 'announcement':
+            url = url_for('announcements', course_id=row['course_id'])
+        elif kind == 'discussion':
+            url = url_for('discussion_thread', discussion_id=row['id'])
+        else:
+            url = thread_post_url(row['discussion_id'], row)
+        results.append({
+            'kind': kind, 'title': row['title'], 'created_at': row['created_at'],
+            'course_id': row['course_id'], 'course_name': course_names.get(row['course_id'], ''),
+            'url': url, 'excerpt': search_excerpt(row['body'] or '', words),
+        })
+    return results
+
+
+def search_excerpt(body, words):
+    """(πριν, λέξη, μετά): απόσπασμα του body γύρω από την πρώτη εμφάνιση κάποιας από τις words."""
+    body = unicodedata.normalize('NFC', body)
+    folded = body.translate(_GREEK_FOLD_TABLE).lower()
+    found = [(folded.find(word), word) for word in words if folded.find(word) >= 0]
+    if not found:
+        return (body[:SEARCH_EXCERPT_CHARS], '', '')
+    pos, word = min(found)
+    start = max(0, pos - SEARCH_EXCERPT_CHARS // 3)
+    end = pos + len(word)
+    stop = start + SEARCH_EXCERPT_CHARS
+    return (('…' if start else '') + body[start:pos], body[pos:end],
+            body[end:stop] + ('…' if stop < len(body) else ''))
+
+
+@app.route('/search')
+@login_required
+def search():
+    """Αναζήτηση σε υλικό, ανακοινώσεις και συζητήσεις των μαθημάτων του χρήστη"""
+    db = get_db()
+    query = request.args.get('q', '').strip()
+    course_ids = user_course_ids(db, session['user_id'], session['role'])
+    course_id = request.args.get('course_id', type=int)
+    if course_id is not None:
+        course_ids = [course_id] if course_id in course_ids else []
+    page = max(request.args.get('page', 1, type=int), 1)
+    results = search_content(db, query, course_ids, SEARCH_PAGE_SIZE + 1, (page - 1) * SEARCH_PAGE_SIZE) \
+        if query else []
+    has_next = len(results) > SEARCH_PAGE_SIZE
+    return render_template('search.html', query=query, results=results[:SEARCH_PAGE_SIZE],
+                           course_id=course_id, page=page, has_next=has_next)
+
+
 # Ημερολογιο / Συμβαντα
 
 @app.route('/course/<int:course_id>/events')
 @login_required
+@conditional_course_response
 def events(course_id):
     """Προβολή συμβάντων"""
     db = get_db()
@@ -1673,7 +4099,6 @@ def events(course_id):
     events_list = db.execute(
         'SELECT * FROM events WHERE course_id = ? ORDER BY event_date ASC', (course_id,)
     ).fetchall()
-    db.close()
     return render_template('events.html', course=course, events=events_list)
 
 
@@ -1696,10 +4121,8 @@ def create_event(course_id):
                        (course_id, title, description, event_date, event_type))
             db.commit()
             flash('Το συμβάν δημιουργήθηκε!', 'success')
-            db.close()
             return redirect(url_for('events', course_id=course_id))
 
-    db.close()
     return render_template('create_event.html', course=course)
 
 
@@ -1735,11 +4158,73 @@ def grades(course_id):
         (course_id, session['user_id'])
     ).fetchall()
 
-    db.close()
     return render_template('grades.html', course=course,
                            assignment_grades=assignment_grades, test_grades=test_grades)
 
 
+# Στήλες ταξινόμησης της σελίδας προόδου (όνομα παραμέτρου -> στήλη του query)
+PROGRESS_SORT_COLUMNS = {
+    'name': 'u.full_name',
+    'assignments': 'submitted_assignments',
+    'assignment_grade': 'avg_assignment_grade',
+    'tests': 'completed_tests',
+    'test_score': 'avg_test_score',
+    'posts': 'discussion_posts',
+}
+PROGRESS_PAGE_SIZE = 50
+
+
+def course_progress(db, course_id, sort='name', order='asc', limit=None, offset=0):
+    """Πρόοδος φοιτητών μαθήματος με ένα query (grouped joins), ταξινομημένη και σε σελίδες."""
+    totals = db.execute(
+        '''SELECT (SELECT COUNT(*) FROM assignments WHERE course_id = ?) AS total_assignments,
+                  (SELECT COUNT(*) FROM tests WHERE course_id = ?) AS total_tests''',
+        (course_id, course_id)
+    ).fetchone()
+    column = PROGRESS_SORT_COLUMNS.get(sort, PROGRESS_SORT_COLUMNS['name'])
+    direction = 'DESC' if order == 'desc' else 'ASC'
+    rows = db.execute(
+        '''SELECT u.id, u.full_name, u.email,
+                  COALESCE(sa.submitted, 0) AS submitted_assignments,
+                  sa.avg_grade AS avg_assignment_grade,
+                  COALESCE(st.completed, 0) AS completed_tests,
+                  st.avg_score AS avg_test_score,
+                  COALESCE(sp.posts, 0) AS discussion_posts
+           FROM enrollments e
+           JOIN users u ON u.id = e.student_id
+           LEFT JOIN (SELECT s.student_id, COUNT(*) AS submitted, AVG(s.grade) AS avg_grade
+                      FROM assignment_submissions s
+                      JOIN assignments a ON s.assignment_id = a.id
+                      WHERE a.course_id = ?
+                      GROUP BY s.student_id) sa ON sa.student_id = u.id
+           LEFT JOIN (SELECT ta.student_id, COUNT(*) AS completed,
+                             AVG(ta.score * 100.0 / ta.max_score) AS avg_score
+                      FROM test_attempts ta
+                      JOIN tests t ON ta.test_id = t.id
+                      WHERE t.course_id = ? AND ta.completed_at IS NOT NULL
+                      GROUP BY ta.student_id) st ON st.student_id = u.id
+           LEFT JOIN (SELECT dp.author_id, COUNT(*) AS posts
+                      FROM discussion_posts dp
+                      JOIN discussions d ON dp.discussion_id = d.id
+                      WHERE d.course_id = ?
+                      GROUP BY dp.author_id) sp ON sp.author_id = u.id
+           WHERE e.course_id = ?
+           ORDER BY ({0}) IS NULL, {0} {1}, u.full_name, u.id
+           LIMIT ? OFFSET ?'''.format(column, direction),
+        (course_id, course_id, course_id, course_id, -1 if limit is None else limit, offset)
+    ).fetchall()
+    return [{
+        'student': {'id': r['id'], 'full_name': r['full_name'], 'email': r['email']},
+        'total_assignments': totals['total_assignments'],
+        'submitted_assignments': r['submitted_assignments'],
+        'avg_assignment_grade': round(r['avg_assignment_grade'], 1) if r['avg_assignment_grade'] else None,
+        'total_tests': totals['total_tests'],
+        'completed_tests': r['completed_tests'],
+        'avg_test_score': round(r['avg_test_score'], 1) if r['avg_test_score'] else None,
+        'discussion_posts': r['discussion_posts'],
+    } for r in rows]
+
+
 @app.route('/course/<int:course_id>/progress')
 @instructor_required
 def progress(course_id):
@@ -1747,71 +4232,113 @@ def progress(course_id):
     db = get_db()
     course = db.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
 
-    # Εγγεγραμμένοι φοιτητές
-    students = db.execute(
-        '''SELECT u.id, u.full_name, u.email FROM users u
-           JOIN enrollments e ON u.id = e.student_id
-           WHERE e.course_id = ?
-           ORDER BY u.full_name''', (course_id,)
-    ).fetchall()
+    sort = request.args.get('sort', 'name')
+    if sort not in PROGRESS_SORT_COLUMNS:
+        sort = 'name'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    total_students = db.execute(
+        'SELECT COUNT(*) FROM enrollments WHERE course_id = ?', (course_id,)
+    ).fetchone()[0]
+    pages = max(1, -(-total_students // PROGRESS_PAGE_SIZE))
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+
+    student_progress = course_progress(db, course_id, sort, order,
+                                       limit=PROGRESS_PAGE_SIZE, offset=(page - 1) * PROGRESS_PAGE_SIZE)
+    return render_template('progress.html', course=course, student_progress=student_progress,
+                           sort=sort, order=order, page=page, pages=pages, total_students=total_students)
+
+
+GRADEBOOK_EXPORT_BATCH = 200  # γραμμές CSV ανά κομμάτι της απάντησης
+
+
+def csv_cell(value):
+    """Κελί CSV χωρίς formula injection: κείμενο που αρχίζει με =, +, -, @ (ή tab/CR) παίρνει πρόθεμα '."""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+def gradebook_items(db, course_id):
+    """Στήλες του βαθμολογίου: (τύπος, id, τίτλος, μέγιστο) για τις εργασίες (κατά προθεσμία) και τα τεστ."""
+    items = [('assignment', r['id'], r['title'], r['max_grade']) for r in db.execute(
+        'SELECT id, title, max_grade FROM assignments WHERE course_id = ? ORDER BY due_date, id', (course_id,))]
+    items += [('test', r['id'], r['title'], None) for r in db.execute(
+        'SELECT id, title FROM tests WHERE course_id = ? ORDER BY created_at, id', (course_id,))]
+    return items
 
-    student_progress = []
-    for student in students:
-        # Εργασίες
-        total_assignments = db.execute(
-            'SELECT COUNT(*) FROM assignments WHERE course_id = ?', (course_id,)
-        ).fetchone()[0]
-        submitted_assignments = db.execute(
-            '''SELECT COUNT(*) FROM assignment_submissions s
-               JOIN assignments a ON s.assignment_id = a.id
-               WHERE a.course_id = ? AND s.student_id = ?''',
-            (course_id, student['id'])
-        ).fetchone()[0]
-        avg_assignment_grade = db.execute(
-            '''SELECT AVG(s.grade) FROM assignment_submissions s
-               JOIN assignments a ON s.assignment_id = a.id
-               WHERE a.course_id = ? AND s.student_id = ? AND s.grade IS NOT NULL''',
-            (course_id, student['id'])
-        ).fetchone()[0]
-
-        # Τεστ
-        total_tests = db.execute(
-            'SELECT COUNT(*) FROM tests WHERE course_id = ?', (course_id,)
-        ).fetchone()[0]
-        completed_tests = db.execute(
-            '''SELECT COUNT(*) FROM test_attempts ta
-               JOIN tests t ON ta.test_id = t.id
-               WHERE t.course_id = ? AND ta.student_id = ? AND ta.completed_at IS NOT NULL''',
-            (course_id, student['id'])
-        ).fetchone()[0]
-        avg_test_score = db.execute(
-            '''SELECT AVG(ta.score * 100.0 / ta.max_score) FROM test_attempts ta
-               JOIN tests t ON ta.test_id = t.id
-               WHERE t.course_id = ? AND ta.student_id = ? AND ta.completed_at IS NOT NULL''',
-            (course_id, student['id'])
-        ).fetchone()[0]
-
-        # Συμμετοχή σε συζητήσεις
-        discussion_posts = db.execute(
-            '''SELECT COUNT(*) FROM discussion_posts dp
-               JOIN discussions d ON dp.discussion_id = d.id
-               WHERE d.course_id = ? AND dp.author_id = ?''',
-            (course_id, student['id'])
-        ).fetchone()[0]
-
-        student_progress.append({
-            'student': student,
-            'total_assignments': total_assignments,
-            'submitted_assignments': submitted_assignments,
-            'avg_assignment_grade': round(avg_assignment_grade, 1) if avg_assignment_grade else None,
-            'total_tests': total_tests,
-            'completed_tests': completed_tests,
-            'avg_test_score': round(avg_test_score, 1) if avg_test_score else None,
-            'discussion_posts': discussion_posts
-        })
 
-    db.close()
-    return render_template('progress.html', course=course, student_progress=student_progress)
+def gradebook_rows(db, course_id, items):
+    """Γεννήτρια: μία γραμμή ανά εγγεγραμμένο φοιτητή (κατά id) με βαθμό και ποσοστό ανά στήλη και μέσο ποσοστό.
+
+    Διαβάζει το gradebook με έναν cursor ταξινομημένο κατά φοιτητή, οπότε στη μνήμη είναι μόνο ένας φοιτητής.
+    """
+    column = {(item_type, item_id): n for n, (item_type, item_id, _, _) in enumerate(items)}
+    cursor = db.execute(
+        '''SELECT u.id, u.username, u.full_name, u.email, g.item_type, g.item_id, g.score, g.percent
+           FROM enrollments e
+           JOIN users u ON u.id = e.student_id
+           LEFT JOIN gradebook g ON g.course_id = e.course_id AND g.student_id = e.student_id
+           WHERE e.course_id = ?
+           ORDER BY e.student_id''', (course_id,))
+
+    def finish(student, cells):
+        percents = [cells[n * 2 + 1] for n in range(len(items)) if cells[n * 2 + 1] != '']
+        average = round(sum(percents) / len(percents), 2) if percents else ''
+        return [student['username'], student['full_name'], student['email']] + cells + [average]
+
+    student, cells = None, None
+    for row in cursor:
+        if student is None or row['id'] != student['id']:
+            if student is not None:
+                yield finish(student, cells)
+            student, cells = row, [''] * (len(items) * 2)
+        n = column.get((row['item_type'], row['item_id']))
+        if n is not None:
+            cells[n * 2] = '' if row['score'] is None else round(row['score'], 2)
+            cells[n * 2 + 1] = '' if row['percent'] is None else round(row['percent'], 2)
+    if student is not None:
+        yield finish(student, cells)
+
+
+@app.route('/course/<int:course_id>/gradebook.csv')
+@instructor_required
+def export_gradebook(course_id):
+    """Εξαγωγή του βαθμολογίου του μαθήματος σε CSV, σε ροή (σταθερή μνήμη ανεξάρτητα από το πλήθος φοιτητών)."""
+    db = get_db()
+    course = db.execute('SELECT id, instructor_id FROM courses WHERE id = ?', (course_id,)).fetchone()
+    if not course:
+        abort(404)
+    if course['instructor_id'] != session['user_id']:
+        abort(403)
+    items = gradebook_items(db, course_id)
+    header = ['Username', 'Ονοματεπώνυμο', 'Email']
+    for item_type, _, title, max_grade in items:
+        if item_type == 'test':
+            label = 'Τεστ: {}'.format(title)
+        else:
+            label = 'Εργασία: {}'.format(title) + (' (/{:g})'.format(max_grade) if max_grade else '')
+        header += [label, label + ' %']
+    header.append('Μέσος όρος %')
+
+    import csv
+    import io
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')  # BOM, ώστε το Excel να ανοίγει σωστά τα ελληνικά
+        writer.writerow([csv_cell(value) for value in header])
+        for n, row in enumerate(gradebook_rows(db, course_id, items), 1):
+            writer.writerow([csv_cell(value) for value in row])
+            if n % GRADEBOOK_EXPORT_BATCH == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = app.response_class(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename="gradebook-{}.csv"'.format(course_id)
+    return response
 
 
 # Διαχειριση μαθηματος
@@ -1836,9 +4363,9 @@ def enroll(course_id):
         db.execute('INSERT INTO enrollments (course_id, student_id) VALUES (?, ?)',
                    (course_id, session['user_id']))
         db.commit()
+        invalidate_sidebar(session['user_id'], 'student')
         flash('Εγγραφήκατε στο μάθημα επιτυχώς!', 'success')
 
-    db.close()
     return redirect(url_for('dashboard'))
 
 
@@ -1848,10 +4375,10 @@ def all_courses():
     """Λίστα όλων των μαθημάτων"""
     db = get_db()
     courses = db.execute(
-        '''SELECT c.*, u.full_name as instructor_name,
-                  (SELECT COUNT(*) FROM enrollments WHERE course_id = c.id) as student_count
+        '''SELECT c.*, u.full_name as instructor_name, COALESCE(cc.students, 0) as student_count
            FROM courses c
            JOIN users u ON c.instructor_id = u.id
+           LEFT JOIN course_counters cc ON cc.course_id = c.id
            ORDER BY c.name'''
     ).fetchall()
 
@@ -1863,7 +4390,6 @@ def all_courses():
         ).fetchall()
         enrolled_ids = {e['course_id'] for e in enrolled}
 
-    db.close()
     return render_template('courses.html', courses=courses, enrolled_ids=enrolled_ids)
 
 
@@ -1881,7 +4407,7 @@ def create_course():
             db.execute('INSERT INTO courses (name, description, instructor_id, semester) VALUES (?, ?, ?, ?)',
                        (name, description, session['user_id'], semester))
             db.commit()
-            db.close()
+            invalidate_sidebar(session['user_id'], 'instructor')
             flash('Το μάθημα δημιουργήθηκε!', 'success')
             return redirect(url_for('dashboard'))
 
@@ -1890,38 +4416,69 @@ def create_course():
 
 # API - JSON για events (χρησιμοποιειται απο AJAX)
 
+CALENDAR_COLORS = {
+    'lecture': '#0d6efd',
+    'deadline': '#dc3545',
+    'exam': '#ffc107',
+    'general': '#198754'
+}
+
+
+def _iso_day(value):
+    """Η ημερομηνία (YYYY-MM-DD) μιας παραμέτρου start/end σε μορφή ISO (δεκτό και datetime), ή None."""
+    if not value:
+        return None
+    return date.fromisoformat(value[:10]).isoformat()
+
+
+@app.route('/api/events')
 @app.route('/api/events/<int:course_id>')
 @login_required
-def api_events(course_id):
-    """API: Επιστροφή συμβάντων σε JSON για ημερολόγιο"""
+@conditional_course_response
+def api_events(course_id=None):
+    """API: Συμβάντα και προθεσμίες εργασιών σε JSON για ημερολόγιο (μορφή FullCalendar).
+
+    Παράμετροι: start/end (ISO, το end αποκλείεται) και, χωρίς course_id στο path, μία ή
+    περισσότερες course_id (από τα μαθήματα του χρήστη· προεπιλογή όλα). Ο πίνακας
+    γράφεται σταδιακά, χωρίς να φορτωθούν όλες οι γραμμές στη μνήμη.
+    """
+    try:
+        start = _iso_day(request.args.get('start'))
+        end = _iso_day(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'Invalid start/end date'}), 400
+
     db = get_db()
-    events_list = db.execute(
-        'SELECT * FROM events WHERE course_id = ?', (course_id,)
-    ).fetchall()
+    if course_id is not None:
+        course_ids = [course_id]
+    else:
+        course_ids = user_course_ids(db, session['user_id'], session['role'])
+        requested = set(request.args.getlist('course_id', type=int))
+        if requested:
+            course_ids = [cid for cid in course_ids if cid in requested]
+    if not course_ids:
+        return jsonify([])
 
-    events_json = []
-    color_map = {
-        'lecture': '#0d6efd',
-        'deadline': '#dc3545',
-        'exam': '#ffc107',
-        'general': '#198754'
-    }
-    for e in events_list:
-        events_json.append({
-            'id': e['id'],
-            'title': e['title'],
-            'start': e['event_date'],
-            'description': e['description'] or '',
-            'color': color_map.get(e['event_type'], '#6c757d')
-        })
+    def generate():
+        yield '['
+        for i, r in enumerate(calendar_rows(db, course_ids, start, end)):
+            yield (',' if i else '') + json.dumps({
+                'id': r['id'] if r['type'] == 'event' else 'a{}'.format(r['id']),
+                'title': r['title'],
+                'start': r['date'],
+                'description': r['description'] or '',
+                'color': CALENDAR_COLORS.get(r['event_type'], '#6c757d'),
+                'type': r['type'],
+                'course_id': r['course_id'],
+            }, ensure_ascii=False, separators=(',', ':'))
+        yield ']'
 
-    db.close()
-    return jsonify(events_json)
+    return app.response_class(stream_with_context(generate()), mimetype='application/json')
 
 
 # Migration: ensure second semester exists (for DBs created before we added it)
 def ensure_second_semester_course():
-    """Αν υπάρχει μόνο ένα μάθημα, πρόσθεσε δεύτερο με άλλο εξάμηνο ώστε να δουλεύει το φίλτρο."""
+    """Αν υπάρχει μόνο ένα μάθημα, πρόσθεσε δεύτερο με άλλο εξάμηνο ώστε να δουλεύει το φίλτρο (commit στο prepare_db)."""
     try:
         db = get_db()
         n = db.execute('SELECT COUNT(*) FROM courses').fetchone()[0]
@@ -1936,27 +4493,279 @@ def ensure_second_semester_course():
                 new_id = db.execute('SELECT last_insert_rowid()').fetchone()[0]
                 for sid in db.execute('SELECT id FROM users WHERE role = ? LIMIT 2', ('student',)).fetchall():
                     db.execute('INSERT INTO enrollments (course_id, student_id) VALUES (?, ?)', (new_id, sid['id']))
-            db.commit()
-        db.close()
     except Exception:
         pass
 
 
 def ensure_semesters_earino_ximerino():
-    """Βεβαιώνει ότι υπάρχουν 2 μαθήματα: 1 Εαρινό, 1 Χειμερινό (για δοκιμή φίλτρου)."""
+    """Βεβαιώνει ότι υπάρχουν 2 μαθήματα: 1 Εαρινό, 1 Χειμερινό (για δοκιμή φίλτρου· commit στο prepare_db)."""
     try:
         db = get_db()
         courses = db.execute('SELECT id, name, semester FROM courses ORDER BY id').fetchall()
-        if len(courses) >= 1:
-            db.execute("UPDATE courses SET semester = ? WHERE id = ?", ('Εαρινό 2025-2026', courses[0]['id']))
-        if len(courses) >= 2:
-            db.execute("UPDATE courses SET semester = ? WHERE id = ?", ('Χειμερινό 2024-2025', courses[1]['id']))
-        db.commit()
-        db.close()
+        for course, semester in zip(courses, ('Εαρινό 2025-2026', 'Χειμερινό 2024-2025')):
+            db.execute("UPDATE courses SET semester = ? WHERE id = ? AND semester IS NOT ?",
+                       (semester, course['id'], semester))
     except Exception:
         pass
 
 
+# --- Demo δεδομένα ημερολογίου (flask --app app seed-demo· στην αρχικοποίηση της βάσης μόνο με SEED_DEMO=1) ---
+
+def _seed_calendar_demo_month(db, cid):
+    """Βάζει 1 event + 1 assignment στον τρέχοντα μήνα αν δεν υπάρχει τίποτα, ώστε να φαίνονται κουκίδες."""
+    today = date.today()
+    y, m = today.year, today.month
+    last_day = monthrange(y, m)[1]
+    month_start = '{:04d}-{:02d}-01'.format(y, m)
+    month_end = '{:04d}-{:02d}-{:02d}'.format(y, m, last_day)
+    added = 0
+    has_event = db.execute(
+        'SELECT 1 FROM events WHERE course_id = ? AND event_date >= ? AND event_date <= ? LIMIT 1',
+        (cid, month_start, month_end)
+    ).fetchone()
+    if not has_event:
+        event_day = min(25, last_day)
+        db.execute(
+            '''INSERT INTO events (course_id, title, description, event_date, event_type)
+               VALUES (?, ?, ?, ?, ?)''',
+            (cid, 'Διάλεξη / Ενότητα', 'Δραστηριότητα μαθήματος', '{:04d}-{:02d}-{:02d}'.format(y, m, event_day), 'lecture')
+        )
+        added += 1
+    has_assignment = db.execute(
+        'SELECT 1 FROM assignments WHERE course_id = ? AND due_date >= ? AND due_date <= ? LIMIT 1',
+        (cid, month_start, month_end)
+    ).fetchone()
+    if not has_assignment:
+        due_day = min(28, last_day)
+        db.execute(
+            '''INSERT INTO assignments (course_id, title, description, due_date, max_grade)
+               VALUES (?, ?, ?, ?, ?)''',
+            (cid, 'Δραστηριότητα μήνα', 'Δραστηριότητα για το τρέχον μήνα.', '{:04d}-{:02d}-{:02d}'.format(y, m, due_day), 10)
+        )
+        added += 1
+    return added
+
+
+def seed_calendar_demo(db):
+    """Demo δραστηριότητα του τρέχοντος μήνα στο πρώτο μάθημα κάθε εκπαιδευτή και κάθε φοιτητή.
+
+    Idempotent: δεν προσθέτει τίποτα σε μάθημα που έχει ήδη event/εργασία μέσα στον μήνα.
+    Επιστρέφει πόσες γραμμές προστέθηκαν.
+    """
+    course_ids = [r[0] for r in db.execute(
+        '''SELECT MIN(id) FROM courses GROUP BY instructor_id
+           UNION SELECT MIN(course_id) FROM enrollments GROUP BY student_id'''
+    ).fetchall()]
+    added = sum(_seed_calendar_demo_month(db, cid) for cid in course_ids)
+    db.commit()
+    return added
+
+
+@app.cli.command('seed-demo')
+def seed_demo_command():
+    """Προσθέτει demo δραστηριότητα στο ημερολόγιο του τρέχοντος μήνα (αν λείπει)."""
+    added = seed_calendar_demo(get_db())
+    print('seed-demo: {} γραμμές προστέθηκαν'.format(added))
+
+
+# --- Έλεγχος query plans (flask --app app check-query-plans) ---
+
+# (endpoint, πίνακας) που επιτρέπεται να διαβάζεται ολόκληρος: η λίστα όλων των μαθημάτων
+FULL_SCAN_ALLOWED = {('all_courses', 'courses')}
+# Πρόθεμα των statements που εκτελεί το ίδιο το FTS5 στους shadow πίνακες του search_index
+FTS_INTERNAL_SQL = "'main'.'search_index_"
+
+
+def _route_urls(db):
+    """Τα GET routes για κάθε ρόλο, με ids από τα υπάρχοντα δεδομένα."""
+    course = db.execute('''SELECT c.id, c.instructor_id, MIN(e.student_id) AS student_id FROM courses c
+                           JOIN enrollments e ON e.course_id = c.id
+                           GROUP BY c.id ORDER BY c.id LIMIT 1''').fetchone()
+    if not course:
+        return {}
+    cid = course['id']
+    test = db.execute('SELECT id FROM tests WHERE course_id = ? LIMIT 1', (cid,)).fetchone()
+    attempt = db.execute('SELECT id FROM test_attempts LIMIT 1').fetchone()
+    discussion = db.execute('SELECT id FROM discussions WHERE course_id = ? LIMIT 1', (cid,)).fetchone()
+    assignment = db.execute('SELECT id FROM assignments WHERE course_id = ? LIMIT 1', (cid,)).fetchone()
+    submission = db.execute('SELECT id FROM assignment_submissions LIMIT 1').fetchone()
+    common = ['/dashboard', '/courses', '/api/events/{}'.format(cid),
+              '/api/events?start=2026-01-01&end=2026-07-01&course_id={}'.format(cid)] + [
+        '/course/{}/{}'.format(cid, page)
+        for page in ('materials', 'announcements', 'assignments', 'tests', 'discussions', 'events')]
+    if discussion:
+        common.append('/discussion/{}'.format(discussion['id']))
+    announcement = db.execute('SELECT title FROM announcements WHERE course_id = ? LIMIT 1', (cid,)).fetchone()
+    if announcement:
+        common.append('/search?q={}'.format(quote(announcement['title'].split()[0])))
+    if attempt:
+        common.append('/test/result/{}'.format(attempt['id']))
+    instructor = common + ['/course/{}/progress'.format(cid), '/course/{}/gradebook.csv'.format(cid)]
+    if submission:
+        instructor.append('/submission/{}/grade'.format(submission['id']))
+    student = common + ['/course/{}/grades'.format(cid)]
+    if test:
+        student.append('/test/{}/take'.format(test['id']))
+    if assignment:
+        student.append('/assignment/{}/submit'.format(assignment['id']))
+    return {('instructor', course['instructor_id']): instructor, ('student', course['student_id']): student}
+
+
+def check_query_plans():
+    """Εκτελεί τα routes με το test client, καταγράφει κάθε SELECT και ελέγχει το EXPLAIN QUERY PLAN.
+
+    Επιστρέφει λίστα (sql, γραμμή plan) για κάθε πλήρη σάρωση πίνακα που δεν είναι στο FULL_SCAN_ALLOWED,
+    και (sql, 'WRITE ON GET') για κάθε εγγραφή στη βάση κατά τη διάρκεια ενός GET.
+    """
+    statements = []
+    current = {'endpoint': None}
+    with app.app_context():
+        urls = _route_urls(get_db())
+    adapter = app.url_map.bind('localhost')
+    _db_pool.trace_callback = lambda sql: statements.append((current['endpoint'], sql))
+    try:
+        for (role, user_id), paths in urls.items():
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['role'] = role
+            for path in paths:
+                current['endpoint'] = adapter.match(path.split('?')[0])[0]
+                # Το σώμα διαβάζεται ώστε να εκτελεστούν και τα queries των streaming απαντήσεων
+                response = client.get(path)
+                response.get_data()
+                response.close()
+    finally:
+        _db_pool.trace_callback = None
+
+    problems = []
+    with app.app_context():
+        db = get_db()
+        for endpoint, sql in dict.fromkeys(statements):
+            # Εσωτερικά statements του FTS5 στους shadow πίνακες ('main'.'search_index_config' κ.λπ.),
+            # όχι queries της εφαρμογής
+            if FTS_INTERNAL_SQL in sql:
+                continue
+            # Τα GET είναι μόνο αναγνώσεις (μπορούν να τρέξουν χωρίς το lock του writer)
+            if sql.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE', 'REPLACE')):
+                problems.append((' '.join(sql.split()), 'WRITE ON GET'))
+                continue
+            if not sql.lstrip().upper().startswith('SELECT') or 'pragma_' in sql:
+                continue
+            alias_of = dict(_sql_aliases(sql))
+            for row in db.execute('EXPLAIN QUERY PLAN ' + sql).fetchall():
+                detail = row['detail']
+                # SCAN = ανάγνωση ολόκληρου του πίνακα (ή ολόκληρου ευρετηρίου), σε αντίθεση με SEARCH
+                if not detail.startswith('SCAN ') or detail.startswith(('SCAN CONSTANT', 'SCAN (')):
+                    continue
+                # FTS5 με MATCH (idxStr με 'M') διαβάζει μόνο το ευρετήριο όρων, όχι όλο τον πίνακα
+                if ' VIRTUAL TABLE INDEX ' in detail and 'M' in detail.rsplit(':', 1)[-1]:
+                    continue
+                alias = detail.split()[1]
+                if (endpoint, alias_of.get(alias, alias)) not in FULL_SCAN_ALLOWED:
+                    problems.append((' '.join(sql.split()), detail))
+    return problems
+
+
+def _sql_aliases(sql):
+    """Ζεύγη alias -> πίνακας από τα FROM/JOIN ενός query."""
+    words = sql.replace(',', ' ').split()
+    pairs = []
+    for i, word in enumerate(words[:-1]):
+        if word.upper() in ('FROM', 'JOIN'):
+            name = words[i + 1]
+            alias = words[i + 2] if i + 2 < len(words) else name
+            if alias.upper() == 'AS' and i + 3 < len(words):
+                alias = words[i + 3]
+            pairs.append((alias, name))
+            pairs.append((name, name))
+    return pairs
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Αποτυγχάνει (exit 1) αν κάποιο query των routes κάνει πλήρη σάρωση πίνακα ή αν ένα GET γράφει."""
+    problems = check_query_plans()
+    for sql, detail in problems:
+        print('{}\n    {}'.format(detail, sql))
+    if problems:
+        raise SystemExit(1)
+    print('OK: όλα τα queries των routes χρησιμοποιούν ευρετήρια.')
+
+
+# --- Χρόνος ψυχρής εκκίνησης (flask --app app check-cold-start / import-report) ---
+
+def _run_app_process(args, db_path):
+    """Νέο process του Python που κάνει import το app (με DB_PATH=db_path)· επιστρέφει (stdout, stderr)."""
+    import subprocess  # μόνο για τα CLI της ψυχρής εκκίνησης· όχι στο import του app
+    env = {k: v for k, v in os.environ.items() if k not in ('DATABASE_URL', 'VERCEL')}
+    out = subprocess.run([sys.executable] + args, env=dict(env, DB_PATH=db_path), capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return out.stdout, out.stderr
+
+
+def measure_cold_start(runs=5):
+    """Διάμεσος STARTUP_MS (ms) σε νέα processes: 'fresh' με νέα βάση κάθε φορά, 'warm' με υπάρχουσα."""
+    import statistics
+    import tempfile
+
+    def run(db_path):
+        return float(_run_app_process(['-c', 'import app; print(app.STARTUP_MS)'], db_path)[0].split()[-1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh = [run(os.path.join(tmp, 'fresh{}.db'.format(i))) for i in range(runs)]
+        warm = [run(os.path.join(tmp, 'fresh0.db')) for _ in range(runs)]
+    return {'fresh': statistics.median(fresh), 'warm': statistics.median(warm)}
+
+
+def import_report(db_path=None):
+    """Ανάλυση του python -X importtime για το import του app: [(όνομα, βάθος, self μs, cumulative μs)].
+
+    Το βάθος 0 είναι το ίδιο το app (self = σώμα του module: routes, migrations, εκκίνηση βάσης).
+    """
+    stderr = _run_app_process(['-X', 'importtime', '-c', 'import app'], db_path or DB_PATH)[1]
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    # Κάθε module γράφεται μετά από όσα έκανε import, οπότε του app προηγούνται τα δικά του (βαθύτερα)
+    end = max(i for i, row in enumerate(rows) if row[0] == 'app' and row[1] == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    return [(name, depth, s, c) for name, depth, s, c in rows[start:end + 1]]
+
+
+@app.cli.command('import-report')
+@click.option('--limit', default=15, help='Πόσα modules ανά λίστα.')
+def import_report_command(limit):
+    """Χρόνος import του app: άμεσα imports κατά cumulative και τα ακριβότερα modules κατά self."""
+    rows = import_report()
+    total = next(c for name, depth, _, c in rows if depth == 0)
+    print('app: {:.1f} ms συνολικά, {:.1f} ms στο σώμα του module'.format(
+        total / 1000, next(s for name, depth, s, _ in rows if depth == 0) / 1000))
+    print('\nΆμεσα imports (cumulative):')
+    for name, depth, _, cumulative in sorted((r for r in rows if r[1] == 1), key=lambda r: -r[3])[:limit]:
+        print('  {:>8.1f} ms  {}'.format(cumulative / 1000, name))
+    print('\nModules (self):')
+    for name, depth, self_us, _ in sorted((r for r in rows if r[1] > 0), key=lambda r: -r[2])[:limit]:
+        print('  {:>8.1f} ms  {}'.format(self_us / 1000, name))
+
+
+@app.cli.command('check-cold-start')
+def check_cold_start_command():
+    """Αποτυγχάνει (exit 1) αν ο χρόνος εκκίνησης (νέα ή υπάρχουσα βάση) ξεπερνά το COLD_START_BUDGET_MS."""
+    timings = measure_cold_start()
+    for label, ms in timings.items():
+        print('{}: {:.0f} ms'.format(label, ms))
+    if max(timings.values()) > COLD_START_BUDGET_MS:
+        print('Εκτός ορίου: {:.0f} ms'.format(COLD_START_BUDGET_MS))
+        raise SystemExit(1)
+    print('OK: εκκίνηση εντός ορίου ({:.0f} ms).'.format(COLD_START_BUDGET_MS))
+
 # --- Security headers (best practice: harden responses) ---
 
 @app.after_request
@@ -1996,10 +4805,40 @@ def server_error(e):
     return render_template('errors/500.html'), 500
 
 
-# --- Αρχικοποίηση βάσης δεδομένων (module-level: λειτουργεί και σε Vercel serverless και τοπικά) ---
-init_db()
-ensure_second_semester_course()
-ensure_semesters_earino_ximerino()
+# --- Εκκίνηση εφαρμογής ---
+# Χρόνος ψυχρής εκκίνησης (import Flask + module + βάση)· πάνω από το όριο γράφεται προειδοποίηση στο log.
+# Το flask --app app check-cold-start το μετρά σε νέα processes, με νέα και με υπάρχουσα βάση.
+COLD_START_BUDGET_MS = float(os.environ.get('COLD_START_BUDGET_MS', 750))
+STARTUP_MS = None
+
+
+def start_app():
+    """Προετοιμασία της εφαρμογής του module, μία φορά ανά process (οι επόμενες κλήσεις δεν κάνουν τίποτα).
+
+    Όλη η δουλειά με side effects της εκκίνησης γίνεται εδώ: βάση (prepare_db, fast path), demo
+    ημερολόγιο (μόνο με SEED_DEMO=1) και συνέχιση της ουράς υποβολών. Καλείται στο import, οπότε
+    Vercel, flask --app app και gunicorn app:app βρίσκουν το app έτοιμο· με --preload τρέχει μία φορά
+    στον master και οι workers μοιράζονται copy-on-write τον κώδικα και τον πίνακα routes. Οι συνδέσεις
+    της βάσης και ο writer της ουράς ανοίγουν ξανά ανά process (έλεγχος pid).
+    """
+    global STARTUP_MS
+    if STARTUP_MS is not None:
+        return
+    with app.app_context():
+        initialized = prepare_db()
+        # Σε ζεστή εκκίνηση η βάση δεν αγγίζεται ξανά· το demo ημερολόγιο μόνο σε νέα/αναβαθμισμένη βάση
+        if initialized and os.environ.get('SEED_DEMO', '0').lower() in ('1', 'true', 'yes'):
+            seed_calendar_demo(get_db())
+    # Υποβολές που είχαν μείνει στο journal (π.χ. πριν από restart) εφαρμόζονται στην εκκίνηση
+    if submission_queue is not None and submission_queue.has_pending():
+        submission_queue.start()
+    STARTUP_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    if STARTUP_MS > COLD_START_BUDGET_MS:
+        app.logger.warning('Cold start %.0f ms (όριο %.0f ms, αρχικοποίηση βάσης: %s)',
+                           STARTUP_MS, COLD_START_BUDGET_MS, 'ναι' if initialized else 'όχι')
+
+
+start_app()
 
 
 # Εκκινηση (τοπική ανάπτυξη)
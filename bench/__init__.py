@@ -0,0 +1,11 @@
+"""
+Benchmark του LMS: συνθετικά δεδομένα κλίμακας πανεπιστημίου και μέτρηση των routes.
+
+    python -m bench generate --db /tmp/bench.db --preset university
+    python -m bench run --db /tmp/bench.db --mode client --save-baseline bench/baseline.json
+    python -m bench run --db /tmp/bench.db --mode http --concurrency 16 --compare bench/baseline.json
+
+Το generate προσθέτει σε νέα βάση (σχήμα και demo δεδομένα από το app) χρήστες, μαθήματα, υλικό,
+εργασίες, υποβολές, τεστ, απαντήσεις και συζητήσεις, με σταθερό seed ώστε το ίδιο preset να δίνει
+πάντα τα ίδια δεδομένα. Το run μετρά p50/p95/p99, queries ανά request και throughput ανά route.
+"""
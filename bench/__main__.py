@@ -0,0 +1,58 @@
+"""python -m bench generate | run (βλ. bench/__init__.py)."""
+
+import argparse
+import sys
+
+from bench.dataset import PRESETS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmark του LMS')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='συνθετικά δεδομένα σε νέα βάση')
+    gen.add_argument('--db', required=True, help='αρχείο SQLite (δημιουργείται)')
+    gen.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    gen.add_argument('--seed', type=int, default=42)
+    for key, value in PRESETS['small'].items():
+        gen.add_argument('--' + key.replace('_', '-'), dest=key, type=type(value), default=None)
+
+    run = commands.add_parser('run', help='μέτρηση των routes')
+    run.add_argument('--db', required=True)
+    run.add_argument('--mode', choices=('client', 'http'), default='client')
+    run.add_argument('--url', help='υπάρχων server (π.χ. gunicorn) αντί για τον τοπικό, στο --mode http')
+    run.add_argument('--requests', type=int, default=50, help='requests ανά route')
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--users', type=int, default=20, help='χρήστες ανά ρόλο')
+    run.add_argument('--save-baseline', metavar='PATH')
+    run.add_argument('--compare', metavar='PATH', help='baseline για σύγκριση (exit 1 σε παλινδρόμηση)')
+    run.add_argument('--tolerance', type=float, default=0.2, help='επιτρεπτή αύξηση του p95 (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        import os
+        from bench.dataset import generate
+        if os.path.exists(args.db):
+            parser.error('{} υπάρχει ήδη· το generate γράφει σε νέα βάση'.format(args.db))
+        sizes = {key: getattr(args, key) for key in PRESETS['small']}
+        counts = generate(args.db, args.preset, args.seed, **sizes)
+        print('σύνολο: {:,} γραμμές'.format(sum(counts.values())))
+        return 0
+
+    from bench import load
+    result = load.run(args.db, args.mode, args.requests, args.concurrency, args.users, args.url)
+    print(load.format_report(result))
+    status = 0
+    if args.compare:
+        problems = load.compare(result['routes'], load.load_baseline(args.compare), args.tolerance)
+        for problem in problems:
+            print('ΠΑΛΙΝΔΡΟΜΗΣΗ ' + problem)
+        status = 1 if problems else 0
+    if args.save_baseline:
+        load.save_baseline(result, args.save_baseline)
+        print('baseline: ' + args.save_baseline)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Συνθετικά δεδομένα για το benchmark (python -m bench generate)."""
+
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+# Μέγεθος ανά preset· κάθε τιμή αλλάζει και από τη γραμμή εντολών (π.χ. --students 20000)
+PRESETS = {
+    'small': dict(students=500, instructors=20, courses=40, courses_per_student=5,
+                  materials=15, announcements=10, assignments=6, tests=3, questions=8,
+                  discussions=8, posts=10, events=8, submit_rate=0.85, attempt_rate=0.8),
+    'medium': dict(students=5000, instructors=150, courses=300, courses_per_student=6,
+                   materials=20, announcements=15, assignments=8, tests=4, questions=10,
+                   discussions=10, posts=15, events=10, submit_rate=0.85, attempt_rate=0.8),
+    'university': dict(students=50000, instructors=1500, courses=2000, courses_per_student=6,
+                       materials=25, announcements=20, assignments=8, tests=4, questions=10,
+                       discussions=12, posts=20, events=12, submit_rate=0.85, attempt_rate=0.8),
+}
+
+# Όλοι οι συνθετικοί χρήστες έχουν κωδικό student123 (instructorN / studentN), ώστε το run --mode http
+# να συνδέεται μέσω /login· το hash είναι το ίδιο με των demo λογαριασμών.
+PASSWORD = 'student123'
+
+SEMESTERS = ('Εαρινό 2025-2026', 'Χειμερινό 2024-2025')
+TOPICS = ('Αλγόριθμοι', 'Δομές Δεδομένων', 'Βάσεις Δεδομένων', 'Δίκτυα Υπολογιστών', 'Λειτουργικά Συστήματα',
+          'Τεχνητή Νοημοσύνη', 'Μηχανική Μάθηση', 'Ασφάλεια Πληροφοριών', 'Γραφικά', 'Μεταγλωττιστές',
+          'Κατανεμημένα Συστήματα', 'Τεχνολογία Λογισμικού', 'Πιθανότητες', 'Γραμμική Άλγεβρα')
+WORDS = ('εξέταση', 'διάλεξη', 'εργαστήριο', 'άσκηση', 'παράδοση', 'προθεσμία', 'βαθμολογία', 'σημειώσεις',
+         'διαφάνειες', 'αναδρομή', 'πολυπλοκότητα', 'ταξινόμηση', 'γράφος', 'δέντρο', 'ερώτηση', 'λύση',
+         'παράδειγμα', 'κεφάλαιο', 'ενότητα', 'βιβλιογραφία', 'query', 'index', 'python', 'thread')
+MATERIAL_TYPES = ('document', 'video', 'presentation', 'image')
+EVENT_TYPES = ('lecture', 'lab', 'exam', 'general')
+
+# Σταθερή ημερομηνία αναφοράς ώστε τα δεδομένα να είναι αναπαραγώγιμα
+BASE_DATE = datetime(2026, 1, 15, 10, 0, 0)
+
+
+def _stamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _text(rnd, words):
+    return ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def prepare_schema(db_path):
+    """Δημιουργεί τη βάση με το σχήμα (και τα demo δεδομένα) του app, χωρίς το demo ημερολόγιο."""
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['DB_PATH'] = db_path
+    os.environ['SEED_DEMO'] = '0'
+    os.environ.setdefault('SQL_TRACE_RATE', '0')  # χωρίς το κόστος του tracing, εκτός αν ζητηθεί
+    import app  # noqa: F401  (το import τρέχει το start_app)
+    return app
+
+
+class _Ids:
+    """Επόμενο id ανά πίνακα (τα ids δίνονται ρητά, ώστε να συνδέονται οι γραμμές χωρίς queries)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.next = {}
+
+    def take(self, table, count):
+        start = self.next.get(table)
+        if start is None:
+            start = (self.conn.execute('SELECT MAX(id) FROM ' + table).fetchone()[0] or 0) + 1
+        self.next[table] = start + count
+        return range(start, start + count)
+
+
+def generate(db_path, preset='small', seed=42, log=print, **overrides):
+    """Γεμίζει τη βάση db_path με συνθετικά δεδομένα· επιστρέφει πόσες γραμμές μπήκαν ανά πίνακα."""
+    app = prepare_schema(db_path)
+    size = dict(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    ids = _Ids(conn)
+    counts = {}
+
+    def insert(table, columns, rows):
+        started = time.perf_counter()
+        cursor = conn.executemany('INSERT INTO {} ({}) VALUES ({})'.format(
+            table, ', '.join(columns), ', '.join('?' * len(columns))), rows)
+        conn.commit()
+        counts[table] = counts.get(table, 0) + cursor.rowcount
+        log('{:<24} {:>10,} ({:.1f} s)'.format(table, cursor.rowcount, time.perf_counter() - started))
+
+    password = app.DEMO_PASSWORD_HASHES[PASSWORD]
+    instructors = list(ids.take('users', size['instructors']))
+    students = list(ids.take('users', size['students']))
+    insert('users', ('id', 'username', 'password', 'full_name', 'email', 'role'), (
+        [(uid, 'instructor{}'.format(n), password, 'Εκπαιδευτής {}'.format(n),
+          'instructor{}@unipi.gr'.format(n), 'instructor') for n, uid in enumerate(instructors, 1)] +
+        [(uid, 'student{}'.format(n), password, 'Φοιτητής {}'.format(n),
+          'student{}@students.unipi.gr'.format(n), 'student') for n, uid in enumerate(students, 1)]))
+
+    courses = list(ids.take('courses', size['courses']))
+    course_instructor = {cid: instructors[i % len(instructors)] for i, cid in enumerate(courses)}
+    insert('courses', ('id', 'name', 'description', 'instructor_id', 'semester'), (
+        (cid, '{} {}'.format(TOPICS[i % len(TOPICS)], i + 1), _text(rnd, 12), course_instructor[cid],
+         SEMESTERS[i % 2]) for i, cid in enumerate(courses)))
+
+    roster = {cid: [] for cid in courses}
+    for sid in students:
+        for cid in rnd.sample(courses, min(size['courses_per_student'], len(courses))):
+            roster[cid].append(sid)
+    insert('enrollments', ('course_id', 'student_id'),
+           ((cid, sid) for cid in courses for sid in roster[cid]))
+
+    def days_ago(max_days):
+        return _stamp(BASE_DATE - timedelta(days=rnd.randint(0, max_days), minutes=rnd.randint(0, 1440)))
+
+    insert('materials', ('course_id', 'title', 'description', 'material_type', 'created_at'), (
+        (cid, 'Διάλεξη {}: {}'.format(n, rnd.choice(TOPICS)), _text(rnd, 20), rnd.choice(MATERIAL_TYPES),
+         days_ago(365)) for cid in courses for n in range(1, size['materials'] + 1)))
+    insert('announcements', ('course_id', 'title', 'content', 'author_id', 'created_at'), (
+        (cid, _text(rnd, 4), _text(rnd, 40), course_instructor[cid], days_ago(365))
+        for cid in courses for _ in range(size['announcements'])))
+    insert('events', ('course_id', 'title', 'description', 'event_date', 'event_type'), (
+        (cid, _text(rnd, 3), _text(rnd, 10),
+         (BASE_DATE + timedelta(days=rnd.randint(-60, 120))).strftime('%Y-%m-%d'), rnd.choice(EVENT_TYPES))
+        for cid in courses for _ in range(size['events'])))
+
+    # Εργασίες και υποβολές (80% βαθμολογημένες)
+    assignments = []
+    for cid in courses:
+        for n, aid in enumerate(ids.take('assignments', size['assignments']), 1):
+            assignments.append((aid, cid, n, rnd.choice((10, 20, 100))))
+    insert('assignments', ('id', 'course_id', 'title', 'description', 'due_date', 'max_grade'), (
+        (aid, cid, 'Εργασία {}'.format(n), _text(rnd, 15),
+         (BASE_DATE + timedelta(days=rnd.randint(-90, 60))).strftime('%Y-%m-%d'), max_grade)
+        for aid, cid, n, max_grade in assignments))
+    insert('assignment_submissions', ('assignment_id', 'student_id', 'comment', 'submitted_at', 'grade', 'graded_at'), (
+        (aid, sid, None, days_ago(90), grade, days_ago(30) if grade is not None else None)
+        for aid, cid, _, max_grade in assignments for sid in roster[cid] if rnd.random() < size['submit_rate']
+        for grade in [round(rnd.uniform(0.3, 1) * max_grade, 1) if rnd.random() < 0.8 else None]))
+
+    # Τεστ, ερωτήσεις, προσπάθειες και απαντήσεις
+    tests = [(tid, cid) for cid in courses for tid in ids.take('tests', size['tests'])]
+    insert('tests', ('id', 'course_id', 'title', 'description', 'duration_minutes'), (
+        (tid, cid, 'Τεστ {}'.format(tid), _text(rnd, 10), 30) for tid, cid in tests))
+    questions = {tid: list(ids.take('test_questions', size['questions'])) for tid, _ in tests}
+    options = json.dumps(['Α', 'Β', 'Γ', 'Δ'], ensure_ascii=False)
+    insert('test_questions', ('id', 'test_id', 'question_text', 'question_type', 'options', 'correct_answer', 'points'), (
+        (qid, tid, _text(rnd, 8) + ';', 'multiple_choice', options, rnd.choice('ΑΒΓΔ'), 1)
+        for tid, _ in tests for qid in questions[tid]))
+    attempts = []
+    for tid, cid in tests:
+        taking = [sid for sid in roster[cid] if rnd.random() < size['attempt_rate']]
+        for sid, attempt_id in zip(taking, ids.take('test_attempts', len(taking))):
+            correct = [rnd.random() < 0.7 for _ in questions[tid]]
+            attempts.append((attempt_id, tid, sid, correct))
+    insert('test_attempts', ('id', 'test_id', 'student_id', 'score', 'max_score', 'started_at', 'completed_at'), (
+        (attempt_id, tid, sid, sum(correct), len(correct), stamp, stamp)
+        for attempt_id, tid, sid, correct in attempts for stamp in [days_ago(120)]))
+    insert('test_answers', ('attempt_id', 'question_id', 'student_answer', 'is_correct'), (
+        (attempt_id, qid, rnd.choice('ΑΒΓΔ'), int(ok))
+        for attempt_id, tid, _, correct in attempts for qid, ok in zip(questions[tid], correct)))
+    del attempts
+
+    # Συζητήσεις και απαντήσεις
+    discussions = []
+    for cid in courses:
+        people = roster[cid] or [course_instructor[cid]]
+        for did in ids.take('discussions', size['discussions']):
+            discussions.append((did, cid, rnd.choice(people)))
+    insert('discussions', ('id', 'course_id', 'title', 'author_id', 'created_at'), (
+        (did, cid, _text(rnd, 5) + ';', author, days_ago(200)) for did, cid, author in discussions))
+    insert('discussion_posts', ('discussion_id', 'author_id', 'content', 'created_at'), (
+        (did, rnd.choice(roster[cid] + [course_instructor[cid]]) if roster[cid] else author, _text(rnd, 30),
+         days_ago(200)) for did, cid, author in discussions for _ in range(size['posts'])))
+
+    # Χωρίς ANALYZE: οι βάσεις της εφαρμογής δεν έχουν στατιστικά, οπότε ούτε το benchmark
+    conn.close()
+    return counts
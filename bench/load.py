@@ -0,0 +1,257 @@
+"""Μέτρηση των routes (python -m bench run): test client ή ταυτόχρονα HTTP requests, με baseline."""
+
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from bench.dataset import PASSWORD, prepare_schema
+
+
+def percentile(values, pct):
+    """Percentile με nearest-rank σε ταξινομημένη λίστα."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def route_plan(db, users=20, seed=7):
+    """Λίστα (route, ρόλος, user_id, username, path) για δείγμα εκπαιδευτών και φοιτητών της βάσης."""
+    rnd = random.Random(seed)
+    plan = []
+    # Μόνο οι συνθετικοί χρήστες (instructorN / studentN), που έχουν όλοι κωδικό PASSWORD
+    instructors = [r[0] for r in db.execute(
+        "SELECT id FROM users WHERE role = 'instructor' AND username GLOB 'instructor[0-9]*'"
+        " AND id IN (SELECT instructor_id FROM courses)")]
+    students = [r[0] for r in db.execute(
+        "SELECT id FROM users WHERE role = 'student' AND username GLOB 'student[0-9]*'"
+        " AND id IN (SELECT student_id FROM enrollments)")]
+    if not instructors or not students:
+        raise RuntimeError('η βάση δεν έχει συνθετικούς χρήστες· τρέξτε πρώτα python -m bench generate')
+    for role, pool in (('instructor', instructors), ('student', students)):
+        for user_id in rnd.sample(pool, min(users, len(pool))):
+            username = db.execute('SELECT username FROM users WHERE id = ?', (user_id,)).fetchone()[0]
+            if role == 'instructor':
+                course_ids = [r[0] for r in db.execute('SELECT id FROM courses WHERE instructor_id = ?', (user_id,))]
+            else:
+                course_ids = [r[0] for r in db.execute('SELECT course_id FROM enrollments WHERE student_id = ?',
+                                                       (user_id,))]
+            cid = rnd.choice(course_ids)
+            paths = {
+                'dashboard': '/dashboard',
+                'all_courses': '/courses',
+                'materials': '/course/{}/materials'.format(cid),
+                'announcements': '/course/{}/announcements'.format(cid),
+                'assignments': '/course/{}/assignments'.format(cid),
+                'tests': '/course/{}/tests'.format(cid),
+                'discussions': '/course/{}/discussions'.format(cid),
+                'events': '/course/{}/events'.format(cid),
+                'api_events': '/api/events?start=2026-01-01&end=2026-02-01',
+                'search': '/search?q=' + urllib.parse.quote('εξεταση'),
+            }
+            discussion = db.execute('SELECT id FROM discussions WHERE course_id = ? LIMIT 1', (cid,)).fetchone()
+            if discussion:
+                paths['discussion_thread'] = '/discussion/{}'.format(discussion[0])
+            if role == 'instructor':
+                paths['progress'] = '/course/{}/progress'.format(cid)
+            else:
+                paths['grades'] = '/course/{}/grades'.format(cid)
+            plan.extend((route, role, user_id, username, path) for route, path in paths.items())
+    return plan
+
+
+def _summary(samples, queries, serial):
+    report = {}
+    for route, values in sorted(samples.items()):
+        values = sorted(values)
+        report[route] = {
+            'requests': len(values),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'queries': round(sum(queries[route]) / len(queries[route]), 1) if queries.get(route) else None,
+            # Σειριακά (test client): 1 / μέσος χρόνος του route. Με ταυτόχρονα HTTP requests τα routes
+            # μοιράζονται τους workers, οπότε μετρά μόνο το συνολικό throughput (_total).
+            'rps': round(1000.0 * len(values) / sum(values), 1) if serial else None,
+        }
+    return report
+
+
+def run_client(app, plan, requests):
+    """Κάθε route requests φορές με το test client, σειριακά (μετρά και τα queries ανά request)."""
+    clients = {}
+    for _, role, user_id, _, _ in plan:
+        if user_id not in clients:
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['role'] = role
+            clients[user_id] = client
+    by_route = defaultdict(list)
+    for item in plan:
+        by_route[item[0]].append(item)
+
+    statements = []
+    app._db_pool.trace_callback = statements.append
+    samples, queries, errors = defaultdict(list), defaultdict(list), defaultdict(int)
+    try:
+        for route, items in by_route.items():
+            for i in range(requests):
+                _, _, user_id, _, path = items[i % len(items)]
+                del statements[:]
+                t0 = time.perf_counter()
+                response = clients[user_id].get(path)
+                response.get_data()  # οι streaming απαντήσεις (π.χ. api_events) παράγονται εδώ
+                response.close()
+                samples[route].append((time.perf_counter() - t0) * 1000)
+                # Οι γραμμές "-- ..." είναι εσωτερικά statements triggers και FTS5, όχι queries του route
+                queries[route].append(sum(1 for sql in statements if not sql.startswith('--')))
+                # Κάθε route του plan απαντά 200· ανακατεύθυνση (π.χ. στο /login) είναι σφάλμα
+                if response.status_code != 200:
+                    errors[route] += 1
+    finally:
+        app._db_pool.trace_callback = None
+    return _summary(samples, queries, True), dict(errors)
+
+
+def _is_login(url):
+    return urllib.parse.urlsplit(url).path.rstrip('/').endswith('/login')
+
+
+def _login(base_url, username):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    data = urllib.parse.urlencode({'username': username, 'password': PASSWORD}).encode()
+    with opener.open(base_url + '/login', data=data, timeout=30) as response:
+        response.read()
+        if _is_login(response.geturl()):
+            raise RuntimeError('αποτυχία σύνδεσης του {} (κωδικός {})'.format(username, PASSWORD))
+    return opener
+
+
+def run_http(base_url, plan, requests, concurrency):
+    """Όλα τα routes requests φορές το καθένα, με concurrency ταυτόχρονους clients πάνω από HTTP."""
+    openers = {}
+    for _, _, user_id, username, _ in plan:
+        if user_id not in openers:
+            openers[user_id] = _login(base_url, username)
+    by_route = defaultdict(list)
+    for item in plan:
+        by_route[item[0]].append(item)
+    jobs = [(route, items[i % len(items)]) for i in range(requests) for route, items in by_route.items()]
+    random.Random(11).shuffle(jobs)
+
+    samples, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+
+    def fetch(job):
+        route, (_, _, user_id, _, path) = job
+        t0 = time.perf_counter()
+        try:
+            with openers[user_id].open(base_url + path, timeout=60) as response:
+                response.read()
+                # το urllib ακολουθεί τα redirects: κατάληξη στο /login = η συνεδρία χάθηκε
+                ok = response.status == 200 and not _is_login(response.geturl())
+        except OSError:
+            ok = False
+        elapsed = (time.perf_counter() - t0) * 1000
+        with lock:
+            samples[route].append(elapsed)
+            if not ok:
+                errors[route] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, jobs))
+    elapsed = time.perf_counter() - started
+    report = _summary(samples, {}, False)
+    report['_total'] = {'requests': len(jobs), 'rps': round(len(jobs) / elapsed, 1)}
+    return report, dict(errors)
+
+
+def serve(app):
+    """Τοπικός threaded HTTP server (werkzeug) σε τυχαία θύρα· επιστρέφει (base_url, server)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:{}'.format(server.server_port), server
+
+
+def compare(report, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """Παλινδρομήσεις σε σχέση με το baseline: p95 πάνω από (1 + tolerance) ή περισσότερα queries."""
+    problems = []
+    for route, current in report.items():
+        before = baseline.get('routes', {}).get(route)
+        if not before or route.startswith('_'):
+            continue
+        if (current['p95_ms'] > before['p95_ms'] * (1 + tolerance)
+                and current['p95_ms'] - before['p95_ms'] > min_delta_ms):
+            problems.append('{}: p95 {:.1f} ms -> {:.1f} ms'.format(route, before['p95_ms'], current['p95_ms']))
+        if current.get('queries') is not None and before.get('queries') is not None \
+                and current['queries'] > before['queries']:
+            problems.append('{}: queries {} -> {}'.format(route, before['queries'], current['queries']))
+    return problems
+
+
+def run(db_path, mode='client', requests=50, concurrency=8, users=20, url=None):
+    """Εκτελεί το benchmark και επιστρέφει {'meta', 'routes', 'errors'}."""
+    app = prepare_schema(db_path)
+    with app.app.app_context():
+        db = app.get_db()
+        plan = route_plan(db, users)
+        counts = {table: db.execute('SELECT COUNT(*) FROM ' + table).fetchone()[0]
+                  for table in ('users', 'courses', 'enrollments', 'assignment_submissions',
+                                'test_answers', 'discussion_posts')}
+    if mode == 'client':
+        report, errors = run_client(app, plan, requests)
+    else:
+        server = None
+        if not url:
+            url, server = serve(app)
+        try:
+            report, errors = run_http(url.rstrip('/'), plan, requests, concurrency)
+        finally:
+            if server is not None:
+                server.shutdown()
+    meta = {'mode': mode, 'requests': requests, 'concurrency': concurrency if mode == 'http' else 1,
+            'users': users, 'rows': counts, 'db': os.path.basename(db_path),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+    return {'meta': meta, 'routes': report, 'errors': errors}
+
+
+def format_report(result):
+    lines = ['{:<20} {:>6} {:>9} {:>9} {:>9} {:>8} {:>8}'.format(
+        'route', 'n', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'req/s')]
+    for route, r in result['routes'].items():
+        if route.startswith('_'):
+            continue
+        lines.append('{:<20} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>8} {:>8}'.format(
+            route, r['requests'], r['p50_ms'], r['p95_ms'], r['p99_ms'],
+            '-' if r['queries'] is None else r['queries'], '-' if r['rps'] is None else r['rps']))
+    total = result['routes'].get('_total')
+    if total:
+        lines.append('σύνολο: {} requests, {} req/s'.format(total['requests'], total['rps']))
+    for route, count in result['errors'].items():
+        lines.append('σφάλματα {}: {}'.format(route, count))
+    return '\n'.join(lines)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(result, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
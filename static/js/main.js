@@ -99,6 +99,33 @@
             }, { passive: true });
         }
 
+        // Infinite scroll for keyset-paginated lists: fetch ?format=json when the "more" link is visible
+        document.querySelectorAll('a[data-page-next]').forEach(function(more) {
+            var items = document.querySelector('[data-page-items]');
+            if (!items || !('IntersectionObserver' in window)) return;
+            var loading = false;
+            var observer = new IntersectionObserver(function(entries) {
+                if (!entries[0].isIntersecting || loading) return;
+                loading = true;
+                var href = more.getAttribute('href');
+                var sep = href.indexOf('?') >= 0 ? '&' : '?';
+                fetch(href + sep + 'format=json', { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+                    .then(function(res) { return res.ok ? res.json() : Promise.reject(new Error('page failed')); })
+                    .then(function(data) {
+                        items.insertAdjacentHTML('beforeend', data.html);
+                        if (data.next) {
+                            more.setAttribute('href', data.next);
+                        } else {
+                            observer.disconnect();
+                            more.remove();
+                        }
+                        loading = false;
+                    })
+                    .catch(function() { observer.disconnect(); });
+            }, { rootMargin: '200px' });
+            observer.observe(more);
+        });
+
         // Auto-dismiss alerts after 5s
         document.querySelectorAll('.alert-dismissible').forEach(function(el) {
         setTimeout(function() {
@@ -112,8 +139,9 @@
         }, 5000);
         });
 
-        // File size validation (max 16MB)
+        // File size validation (max 16MB; chunked-upload forms have per-type limits checked by the server)
         document.querySelectorAll('input[type="file"]').forEach(function(input) {
+            if (input.closest('form[data-chunked-upload]')) return;
             input.addEventListener('change', function(e) {
                 var file = e.target.files[0];
                 if (file && file.size > 16 * 1024 * 1024) {
@@ -0,0 +1,123 @@
+// upload.js - UniPi LMS: chunked, resumable uploads for forms with data-chunked-upload
+// Protocol (app.py): POST /uploads -> PUT /uploads/<id>?offset=N (per chunk) -> POST /uploads/<id>/complete
+
+(function() {
+    'use strict';
+
+    var MAX_RETRIES = 3;
+    var STORAGE_PREFIX = 'lms-upload:';
+
+    function toHex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function(b) {
+            return ('0' + b.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    // SHA-256 of a chunk (only in secure contexts; the server checks it when the header is present)
+    function checksum(blob) {
+        if (!window.crypto || !window.crypto.subtle || !blob.arrayBuffer) return Promise.resolve(null);
+        return blob.arrayBuffer()
+            .then(function(buf) { return window.crypto.subtle.digest('SHA-256', buf); })
+            .then(toHex, function() { return null; });
+    }
+
+    function json(res) {
+        return res.json().then(function(data) {
+            data.status = res.status;
+            return data;
+        });
+    }
+
+    function startOrResume(form, file, storageKey) {
+        var saved = localStorage.getItem(storageKey);
+        if (saved) {
+            return fetch('/uploads/' + saved, { credentials: 'same-origin' }).then(json).then(function(data) {
+                if (data.status === 200) return data;
+                localStorage.removeItem(storageKey);
+                return startOrResume(form, file, storageKey);
+            });
+        }
+        var body = new FormData(form);
+        body.delete('file');
+        body.append('kind', form.getAttribute('data-chunked-upload'));
+        body.append('target_id', form.getAttribute('data-target-id'));
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        return fetch('/uploads', { method: 'POST', body: body, credentials: 'same-origin' }).then(json).then(function(data) {
+            if (data.status !== 201) throw new Error(data.error || 'upload failed');
+            localStorage.setItem(storageKey, data.upload_id);
+            return data;
+        });
+    }
+
+    function sendChunks(file, upload, onProgress) {
+        var received = upload.received;
+        var retries = 0;
+
+        function next() {
+            onProgress(received / file.size);
+            if (received >= file.size) return Promise.resolve();
+            var chunk = file.slice(received, Math.min(received + upload.chunk_size, file.size));
+            return checksum(chunk).then(function(sum) {
+                var headers = { 'Content-Type': 'application/octet-stream' };
+                if (sum) headers['X-Chunk-SHA256'] = sum;
+                return fetch('/uploads/' + upload.upload_id + '?offset=' + received, {
+                    method: 'PUT', body: chunk, headers: headers, credentials: 'same-origin'
+                });
+            }).then(json).then(function(data) {
+                if (data.status === 200 || data.status === 409 || data.status === 400) {
+                    if (data.status !== 200 && ++retries > MAX_RETRIES) throw new Error(data.error || 'chunk failed');
+                    if (data.status === 200) retries = 0;
+                    received = data.received;
+                    return next();
+                }
+                throw new Error(data.error || 'chunk failed');
+            }, function(err) {
+                if (++retries > MAX_RETRIES) throw err;
+                return next();
+            });
+        }
+        return next();
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('form[data-chunked-upload]').forEach(function(form) {
+            form.addEventListener('submit', function(e) {
+                var input = form.querySelector('input[type="file"]');
+                var file = input && input.files[0];
+                if (!file || !window.fetch || !window.FormData) return;  // normal form POST
+                e.preventDefault();
+
+                var button = form.querySelector('[type="submit"]');
+                var label = button ? button.innerHTML : '';
+                if (button) button.disabled = true;
+                var storageKey = STORAGE_PREFIX + form.getAttribute('data-chunked-upload') + ':' +
+                    form.getAttribute('data-target-id') + ':' + file.name + ':' + file.size + ':' + file.lastModified;
+
+                startOrResume(form, file, storageKey)
+                    .then(function(upload) {
+                        return sendChunks(file, upload, function(fraction) {
+                            if (button) button.textContent = 'Μεταφόρτωση… ' + Math.floor(fraction * 100) + '%';
+                        }).then(function() { return upload; });
+                    })
+                    .then(function(upload) {
+                        return fetch('/uploads/' + upload.upload_id + '/complete', {
+                            method: 'POST', credentials: 'same-origin'
+                        }).then(json);
+                    })
+                    .then(function(data) {
+                        if (!data.redirect) throw new Error(data.error || 'complete failed');
+                        localStorage.removeItem(storageKey);
+                        window.location.href = data.redirect;
+                    })
+                    .catch(function(err) {
+                        if (button) {
+                            button.disabled = false;
+                            button.innerHTML = label;
+                        }
+                        alert('Η μεταφόρτωση διακόπηκε: ' + err.message + '\nΠατήστε ξανά υποβολή για συνέχεια.');
+                    });
+            });
+        });
+    });
+})();